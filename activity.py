@@ -0,0 +1,122 @@
+import base64
+import datetime
+import json
+
+# A lecturer's recent activity: new exams and answer submissions (with their
+# result once graded), newest first. Each kind is read with a range scan on its
+# (Lecturer_ID, timestamp, id) index and the scans are merged with UNION ALL.
+# Pages are keyset-paginated on (timestamp DESC, kind, id DESC), so a page
+# costs the same however far back the lecturer scrolls.
+SOURCES = {
+    "exam": ("exam e", "e.Created_At", "e.Exam_ID", "e.Lecturer_ID"),
+    "submission": ("answer_submission a", "a.Timestamp", "a.Submission_ID", "a.Lecturer_ID"),
+}
+KINDS = tuple(sorted(SOURCES))
+
+
+def encode_cursor(event):
+    raw = json.dumps([event["timestamp"].isoformat(), event["kind"], event["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Raises ValueError for anything encode_cursor didn't produce."""
+    try:
+        at, kind, id_ = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        at = datetime.datetime.fromisoformat(at)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if kind not in SOURCES or not isinstance(id_, str):
+        raise ValueError("Invalid cursor")
+    return at, kind, id_
+
+
+def _after(kind, at_col, id_col, after):
+    """WHERE clause for rows of `kind` that sort after the cursor."""
+    if after is None:
+        return "", []
+    at, after_kind, after_id = after
+    if kind > after_kind:
+        return f" AND {at_col} <= %s", [at]
+    if kind < after_kind:
+        return f" AND {at_col} < %s", [at]
+    return f" AND ({at_col} < %s OR ({at_col} = %s AND {id_col} < %s))", [at, at, after_id]
+
+
+def _page(cursor, lecturer_id, limit, after, kinds, graded_only):
+    parts, params = [], []
+    for kind in kinds:
+        table, at_col, id_col, lecturer_col = SOURCES[kind]
+        if kind == "submission" and graded_only:
+            table += " JOIN result r ON r.Submission_ID = a.Submission_ID"
+        condition, condition_params = _after(kind, at_col, id_col, after)
+        parts.append(f"""
+            (SELECT '{kind}' AS kind, {at_col} AS at, {id_col} AS id
+             FROM {table}
+             WHERE {lecturer_col} = %s AND {at_col} IS NOT NULL{condition}
+             ORDER BY {at_col} DESC, {id_col} DESC
+             LIMIT %s)
+        """)
+        params += [lecturer_id, *condition_params, limit]
+    cursor.execute(" UNION ALL ".join(parts) + " ORDER BY at DESC, kind ASC, id DESC LIMIT %s", (*params, limit))
+    return cursor.fetchall()
+
+
+def _in(ids):
+    return ", ".join(["%s"] * len(ids))
+
+
+def _details(cursor, rows):
+    """Display fields of the page's rows, one point-lookup query per kind."""
+    details = {}
+    submission_ids = [row["id"] for row in rows if row["kind"] == "submission"]
+    if submission_ids:
+        cursor.execute(f"""
+            SELECT
+                a.Submission_ID AS submission_id,
+                a.Student_ID AS student_id,
+                s.Matrix_Number AS matrix_number,
+                c.Class_Name AS class_name,
+                a.Exam_ID AS exam_id,
+                e.Exam_Name AS exam_name,
+                r.Result_ID AS result_id,
+                r.Score AS score
+            FROM answer_submission a
+            JOIN student s ON s.Student_ID = a.Student_ID
+            JOIN class c ON c.Class_ID = s.Class_ID
+            JOIN exam e ON e.Exam_ID = a.Exam_ID
+            LEFT JOIN result r ON r.Submission_ID = a.Submission_ID
+            WHERE a.Submission_ID IN ({_in(submission_ids)})
+        """, submission_ids)
+        for row in cursor.fetchall():
+            details[("submission", row["submission_id"])] = row
+
+    exam_ids = [row["id"] for row in rows if row["kind"] == "exam"]
+    if exam_ids:
+        cursor.execute(f"""
+            SELECT e.Exam_ID AS exam_id, e.Exam_Name AS exam_name, e.Class_ID AS class_id, c.Class_Name AS class_name
+            FROM exam e
+            JOIN class c ON c.Class_ID = e.Class_ID
+            WHERE e.Exam_ID IN ({_in(exam_ids)})
+        """, exam_ids)
+        for row in cursor.fetchall():
+            details[("exam", row["exam_id"])] = row
+    return details
+
+
+def feed(cursor, lecturer_id, limit=20, after=None, kinds=KINDS, graded_only=False):
+    """
+    Returns (events, next_cursor). `after` is a decoded cursor from a previous
+    page; next_cursor is None on the last page. graded_only limits submissions
+    to those with a result.
+    """
+    rows = _page(cursor, lecturer_id, limit + 1, after, kinds, graded_only)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    details = _details(cursor, rows)
+
+    events = [
+        {"kind": row["kind"], "id": row["id"], "timestamp": row["at"], **details.get((row["kind"], row["id"]), {})}
+        for row in rows
+    ]
+    return events, encode_cursor(events[-1]) if has_more else None
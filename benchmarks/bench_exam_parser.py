@@ -0,0 +1,78 @@
+# Benchmark: single-pass exam markup parser vs the old per-question regex search.
+# Run from the repo root: python benchmarks/bench_exam_parser.py [question_count]
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from exam_parser import parse_exam_markup
+
+
+def build_paper(question_count, schemes_per_question=3):
+    parts = []
+    for q in range(1, question_count + 1):
+        parts.append(f'<Question {q} marks="{schemes_per_question}">')
+        parts.append(f"Explain concept number {q} and give an example of where it is used.")
+        parts.append(f"</Question {q}>")
+        for s in range(1, schemes_per_question + 1):
+            parts.append(f'<Scheme {s} marks="1">Point {s} about concept {q}</Scheme {s}>')
+    return "\n".join(parts)
+
+
+def legacy_parse(cleaned_text):
+    """The parser preview_exam_file used before exam_parser existed."""
+    question_pattern = re.compile(
+        r'<Question\s*(\d+)\s*marks\s*=\s*"?(.*?)"?>(.*?)</Question\s*\1>',
+        re.DOTALL | re.IGNORECASE
+    )
+    scheme_pattern = re.compile(
+        r'<Scheme\s*(\d+)\s*marks\s*=\s*"?(.*?)"?>(.*?)</Scheme\s*\1>',
+        re.DOTALL | re.IGNORECASE
+    )
+    questions_matches = question_pattern.findall(cleaned_text)
+    parsed = []
+    for idx, (q_no, q_marks, q_text) in enumerate(questions_matches, start=1):
+        q_start_match = re.compile(rf'<Question\s*{q_no}\s*marks\s*=\s*"?{q_marks}"?>', re.IGNORECASE).search(cleaned_text)
+        q_start = q_start_match.start() if q_start_match else 0
+        if idx < len(questions_matches):
+            next_q_no, next_q_marks, _ = questions_matches[idx]
+            q_end_match = re.compile(rf'<Question\s*{next_q_no}\s*marks\s*=\s*"?{next_q_marks}"?>', re.IGNORECASE).search(cleaned_text)
+            q_end = q_end_match.start() if q_end_match else len(cleaned_text)
+        else:
+            q_end = len(cleaned_text)
+        schemes_for_q = [
+            {"scheme_no": int(s_no), "scheme_text": s_text.strip(), "marks": int(s_marks)}
+            for s_no, s_marks, s_text in scheme_pattern.findall(cleaned_text[q_start:q_end])
+        ]
+        parsed.append({
+            "question_no": int(q_no),
+            "question_text": q_text.strip(),
+            "marks": int(q_marks),
+            "schemes": schemes_for_q
+        })
+    return parsed
+
+
+def best_of(fn, text, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    question_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    text = build_paper(question_count)
+
+    new = [q.to_dict() for q in parse_exam_markup(text)]
+    assert new == legacy_parse(text), "single-pass parser output differs from the legacy parser"
+
+    legacy_time = best_of(legacy_parse, text)
+    new_time = best_of(parse_exam_markup, text)
+    print(f"{question_count} questions, {len(text)} chars")
+    print(f"legacy regex parser : {legacy_time * 1000:8.2f} ms")
+    print(f"single-pass parser  : {new_time * 1000:8.2f} ms")
+    print(f"speed-up            : {legacy_time / new_time:8.1f}x")
@@ -0,0 +1,66 @@
+# Microbenchmark: login throughput with bcrypt on the dedicated hashing pool,
+# and how much a login burst delays a cheap "CRUD" task on the request threadpool.
+# Run from the repo root: python benchmarks/bench_login.py [logins] [rounds]
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import passwords
+
+
+def crud_task():
+    time.sleep(0.001)
+
+
+async def crud_latency(request_pool, samples=20):
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    for _ in range(samples):
+        start = time.perf_counter()
+        await loop.run_in_executor(request_pool, crud_task)
+        worst = max(worst, time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+    return worst
+
+
+async def burst_on_request_pool(stored_hash, logins, request_pool):
+    """The old behaviour: bcrypt.checkpw straight on the shared request threadpool."""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*[
+        loop.run_in_executor(request_pool, passwords._check, "correct horse", stored_hash)
+        for _ in range(logins)
+    ])
+
+
+async def burst_on_hash_pool(stored_hash, logins):
+    return await asyncio.gather(*[passwords.verify_password("correct horse", stored_hash) for _ in range(logins)])
+
+
+async def measure(label, burst, request_pool, logins):
+    start = time.perf_counter()
+    _, worst = await asyncio.gather(burst, crud_latency(request_pool))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {logins / elapsed:8.1f} logins/s   worst CRUD wait {worst * 1000:8.1f} ms")
+
+
+async def main(logins):
+    stored_hash = passwords._hash("correct horse", passwords.BCRYPT_ROUNDS)
+    # anyio's default threadpool has 40 threads
+    request_pool = ThreadPoolExecutor(max_workers=40)
+    await passwords.verify_password("correct horse", stored_hash)  # start the worker processes
+
+    print(f"{logins} logins at cost {passwords.BCRYPT_ROUNDS}, {passwords.PASSWORD_HASH_WORKERS} hashing workers")
+    await measure("request threadpool", burst_on_request_pool(stored_hash, logins, request_pool), request_pool, logins)
+    await measure("dedicated hashing pool", burst_on_hash_pool(stored_hash, logins), request_pool, logins)
+
+    request_pool.shutdown()
+    passwords.shutdown_pool()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        passwords.BCRYPT_ROUNDS = int(sys.argv[2])
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -0,0 +1,66 @@
+# Benchmark: serializing a /api_result/by_lecturer sized payload the old way
+# (jsonable_encoder + json.dumps, as FastAPI's JSONResponse does) vs orjson,
+# row vs columnar format, and the bytes each would put on the wire.
+# Run from the repo root: python benchmarks/bench_serialization.py [rows]
+import datetime
+import decimal
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.encoders import jsonable_encoder
+from serialization import dumps, to_columnar
+import compression
+
+
+def build_rows(count):
+    start = datetime.datetime(2025, 3, 1, 8, 0, 0)
+    return [
+        {
+            "result_id": f"RS{i:03d}",
+            "student_id": f"S{i % 400:03d}",
+            "student_matrix": f"A{21000000 + i}",
+            "class_name": f"Software Engineering {i % 12}",
+            "timestamp": start + datetime.timedelta(minutes=i),
+            "score": decimal.Decimal(i % 40) / 2,
+        }
+        for i in range(count)
+    ]
+
+
+def fastapi_default(content):
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(count):
+    rows = build_rows(count)
+    cases = [
+        ("jsonable_encoder + json", lambda: fastapi_default({"success": True, "data": rows})),
+        ("orjson rows", lambda: dumps({"success": True, "data": rows})),
+        ("orjson columnar", lambda: dumps({"success": True, "format": "columnar", "data": to_columnar(rows)})),
+    ]
+
+    print(f"{count} rows")
+    print(f"{'':<26} {'time':>10} {'raw':>10} {'gzip':>10} {'br':>10}")
+    for label, fn in cases:
+        elapsed, body = best_of(fn)
+        gz = len(gzip.compress(body, compression.GZIP_LEVEL))
+        br = len(compression.brotli.compress(body, quality=compression.BROTLI_QUALITY)) if compression.brotli else None
+        print(f"{label:<26} {elapsed * 1000:8.2f}ms {len(body):10d} {gz:10d} {br if br is not None else '-':>10}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,69 @@
+# Import-time benchmark for worker startup, based on `python -X importtime`.
+# Run from the repo root:
+#   python benchmarks/importtime.py                 # report for `import main`
+#   python benchmarks/importtime.py --save          # record benchmarks/importtime_baseline.json
+#   python benchmarks/importtime.py --max-regression 20
+# The total is compared against the committed baseline and the script exits 1
+# when startup got more than --max-regression percent slower. Timings depend on
+# the machine, so re-record the baseline with --save when measuring elsewhere.
+# ENABLED_ROUTERS is passed through, so selective workers can be measured too.
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "importtime_baseline.json")
+
+
+def measure(module):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        sys.exit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    # lines look like: "import time:       312 |       1045 |   google.cloud.vision"
+    packages = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  ", 1):  # top-level imports have a single leading space
+            packages[name.strip()] = int(cumulative)
+    return packages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--max-regression", type=float, default=20.0)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(3)]
+    packages = min(runs, key=lambda r: sum(r.values()))
+    total_ms = sum(packages.values()) / 1000
+
+    print(f"import {args.module}: {total_ms:.1f} ms (best of {len(runs)})")
+    for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    if args.save:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"module": args.module, "total_ms": round(total_ms, 1)}, f, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+    elif os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        change = (total_ms - baseline["total_ms"]) / baseline["total_ms"] * 100
+        print(f"Baseline {baseline['total_ms']:.1f} ms, change {change:+.1f}%")
+        if change > args.max_regression:
+            sys.exit(f"Startup import time regressed by {change:.1f}% (limit {args.max_regression}%)")
+
+
+if __name__ == "__main__":
+    main()
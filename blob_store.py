@@ -0,0 +1,91 @@
+import os
+import re
+import shutil
+import tempfile
+
+# Answer images are stored by sha256 under BLOB_STORE_DIR/objects/ab/cd/<hash>,
+# so the same image uploaded twice is stored once and a file never changes
+# after it's written. Thumbnails are made on first request and kept under
+# BLOB_STORE_DIR/thumbs/ab/cd/<hash>_<size>.jpg.
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "blob_store"))
+# Longest side of the thumbnails that may be requested, to bound what gets cached
+THUMBNAIL_SIZES = (128, 256, 512, 1024)
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+
+_HASH = re.compile(r"^[0-9a-f]{64}$")
+
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"%PDF", "application/pdf"),
+    (b"GIF8", "image/gif"),
+)
+
+
+def is_valid_hash(content_hash):
+    return bool(_HASH.match(content_hash or ""))
+
+
+def _shard(kind, content_hash):
+    if not is_valid_hash(content_hash):
+        raise ValueError(f"Not a sha256 hex digest: {content_hash!r}")
+    return os.path.join(BLOB_STORE_DIR, kind, content_hash[:2], content_hash[2:4])
+
+
+def blob_path(content_hash):
+    return os.path.join(_shard("objects", content_hash), content_hash)
+
+
+def exists(content_hash):
+    return is_valid_hash(content_hash) and os.path.exists(blob_path(content_hash))
+
+
+def _write_atomic(path, write):
+    """Writes through a temp file in the target directory and renames it into place."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def put(upload):
+    """Stores a SpooledUpload under its sha256 unless it's already there; returns the hash."""
+    path = blob_path(upload.sha256)
+    if not os.path.exists(path):
+        def write(f):
+            upload.file.seek(0)
+            shutil.copyfileobj(upload.file, f)
+        _write_atomic(path, write)
+    return upload.sha256
+
+
+def media_type(path):
+    with open(path, "rb") as f:
+        head = f.read(8)
+    for signature, kind in _SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    return "application/octet-stream"
+
+
+def thumbnail_path(content_hash, size):
+    """Path of the JPEG thumbnail with longest side `size`, generated on first use."""
+    if size not in THUMBNAIL_SIZES:
+        raise ValueError(f"Thumbnail size must be one of {THUMBNAIL_SIZES}")
+    path = os.path.join(_shard("thumbs", content_hash), f"{content_hash}_{size}.jpg")
+    if os.path.exists(path):
+        return path
+
+    from PIL import Image, ImageOps
+    with Image.open(blob_path(content_hash)) as img:
+        thumb = ImageOps.exif_transpose(img).convert("RGB")
+        thumb.thumbnail((size, size), Image.LANCZOS)
+    # two requests racing here both render it; the second rename wins harmlessly
+    _write_atomic(path, lambda f: thumb.save(f, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True))
+    return path
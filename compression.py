@@ -0,0 +1,137 @@
+import os
+import zlib
+
+# Responses smaller than this are sent as they are; compressing a few hundred
+# bytes costs more than it saves on the wire.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+def _accepted(accept_encoding):
+    """Codings the client accepts, from the Accept-Encoding header."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(coding.strip())
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    accepted = _accepted(accept_encoding or "")
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding):
+        if encoding == "br":
+            self._impl = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._flush = self._impl.finish
+        else:
+            self._impl = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._flush = self._impl.flush
+
+    def compress(self, data):
+        if hasattr(self._impl, "process"):
+            return self._impl.process(data)
+        return self._impl.compress(data)
+
+    def finish(self):
+        return self._flush()
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with brotli (when installed and accepted) or gzip once
+    they are at least `min_bytes`. Responses that are already
+    encoded, aren't text-like, or answer a Range request are passed through.
+    """
+
+    def __init__(self, app, min_bytes=COMPRESS_MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        encoding = choose_encoding(headers.get("accept-encoding"))
+        if encoding is None or "range" in headers:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                response_headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in start["headers"]}
+                content_type = response_headers.get("content-type", "")
+                if (
+                    start["status"] in (204, 206, 304)
+                    or "content-encoding" in response_headers
+                    or "content-range" in response_headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.min_bytes)
+                ):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                raw = [(k, v) for k, v in start["headers"] if k.lower() not in (b"content-length", b"vary")]
+                vary = response_headers.get("vary")
+                raw.append((b"vary", (f"{vary}, Accept-Encoding" if vary else "Accept-Encoding").encode("latin-1")))
+                raw.append((b"content-encoding", encoding.encode("latin-1")))
+                compressor = _Compressor(encoding)
+
+                if not more_body:
+                    data = compressor.compress(body) + compressor.finish()
+                    raw.append((b"content-length", str(len(data)).encode("latin-1")))
+                    await send({**start, "headers": raw})
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                # streamed response: send chunked, compressing as it comes
+                await send({**start, "headers": raw})
+
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.finish()
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,15 +1,119 @@
-import mysql.connector
-from mysql.connector import Error
+import os
+import threading
+import time
+import weakref
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
+from executors import POOL_SIZES, current_pool
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "db_gradingbot"),
+}
+# Each bulkhead group of executors.py gets its own connection pool, as many
+# connections as it has threads by default, so a saturated group can only wait
+# on its own connections. Anything else (the event loop, the OCR and
+# notification pools, scripts) shares the "default" pool. mysql-connector opens
+# every pooled connection up front and allows at most 32 per pool.
+DB_POOL_SIZES = {
+    group: min(int(os.getenv(f"DB_POOL_{group.upper()}", str(POOL_SIZES[group]))), 32)
+    for group in ("auth", "crud", "analytics")
+}
+DB_POOL_SIZES["default"] = min(int(os.getenv("DB_POOL_SIZE", "8")), 32)
+# how long get_connection waits for a free pooled connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def _group_pool(group):
+    with _pool_lock:
+        pool = _pools.get(group)
+        if pool is None:
+            pool = _pools[group] = pooling.MySQLConnectionPool(
+                pool_name=f"gradingbot_{group}",
+                pool_size=DB_POOL_SIZES[group],
+                pool_reset_session=True,
+                **DB_CONFIG
+            )
+        return pool
+
+
+def init_pool():
+    """Opens every group's pool; returns them by group."""
+    return {group: _group_pool(group) for group in DB_POOL_SIZES}
+
+
+def close_pool():
+    with _pool_lock:
+        for pool in _pools.values():
+            pool._remove_connections()
+        _pools.clear()
+
+
+def _return_to_pool(cnx):
+    # close() queues the connection again even when the session reset fails;
+    # the pool reconnects a broken one on its next get_connection()
+    try:
+        cnx.close()
+    except Error as e:
+        print(f"Pooled connection returned without a session reset: {e}")
+
+
+class PooledConnection:
+    """
+    A pooled connection whose close() hands it back to its pool exactly once.
+    One that is never closed goes back when it is garbage-collected instead
+    of holding its pool slot until the worker restarts.
+    """
+
+    def __init__(self, cnx):
+        self._cnx = cnx
+        self._release = weakref.finalize(self, _return_to_pool, cnx)
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+    def close(self):
+        self._release()
+
+
+def allocate_ids(cursor, table, column, prefix, count=1):
+    """
+    Next `count` ids of the PREFIX001, PREFIX002, ... scheme used by every table.
+    Run inside the transaction that inserts them: FOR UPDATE locks the last id,
+    so a concurrent allocation waits until this transaction ends.
+    """
+    cursor.execute(f"SELECT {column} FROM {table} ORDER BY {column} DESC LIMIT 1 FOR UPDATE")
+    row = cursor.fetchone()
+    last = None
+    if row:
+        last = row[column] if isinstance(row, dict) else row[0]
+    start = int(last[len(prefix):]) + 1 if last and last.startswith(prefix) else 1
+    return [f"{prefix}{n:03d}" for n in range(start, start + count)]
+
 
 def get_connection():
+    """
+    Returns a connection from the calling thread's group pool; conn.close()
+    hands it back.
+    """
+    group = current_pool()
+    if group not in DB_POOL_SIZES:
+        group = "default"
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="db_gradingbot"
-        )
-        return connection
+        pool = _group_pool(group)
+        deadline = time.monotonic() + DB_POOL_TIMEOUT
+        while True:
+            try:
+                return PooledConnection(pool.get_connection())
+            except PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
     except Error as e:
         print(f"Error while connecting to MySQL: {e}")
         return None
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from response_cache import versions
+
+# Aggregates are topped up from result_scheme rows newer than the last one seen.
+# Rows whose auto-increment id was taken before a slower transaction committed
+# can slip behind that watermark, so every entry is also recomputed in full
+# this often.
+DIFFICULTY_FULL_REFRESH = float(os.getenv("DIFFICULTY_FULL_REFRESH", "600"))
+DIFFICULTY_CACHE_ENTRIES = int(os.getenv("DIFFICULTY_CACHE_ENTRIES", "500"))
+
+# Regrading rewrites existing outcomes and scheme edits change texts and marks.
+# Deleting a student (and their submissions) or moving one to another class
+# changes the class-filtered totals. Any of them invalidates everything
+# computed so far.
+DEPENDS_ON = ("results", "schemes", "students")
+
+_OUTCOMES_QUERY = """
+    SELECT
+        q.Question_ID AS question_id,
+        q.Question_Text AS question_text,
+        q.Total_Marks AS total_marks,
+        rs.Scheme_ID AS scheme_id,
+        sc.Scheme_Text AS scheme_text,
+        COUNT(*) AS graded,
+        SUM(rs.Awarded_Marks > 0) AS hits,
+        SUM(rs.Awarded_Marks) AS awarded,
+        SUM(rs.Expected_Marks) AS expected,
+        SUM(rs.Similarity) AS similarity,
+        MAX(rs.Outcome_ID) AS last_outcome
+    FROM result_scheme rs
+    JOIN scheme sc ON sc.Scheme_ID = rs.Scheme_ID
+    JOIN question q ON q.Question_ID = sc.Question_ID
+    JOIN result r ON r.Result_ID = rs.Result_ID
+    JOIN answer_submission a ON a.Submission_ID = r.Submission_ID
+    JOIN student st ON st.Student_ID = a.Student_ID
+    WHERE q.Exam_ID = %s AND st.Class_ID = %s AND rs.Outcome_ID > %s
+    GROUP BY q.Question_ID, q.Question_Text, q.Total_Marks, rs.Scheme_ID, sc.Scheme_Text
+"""
+
+_SUMS = ("graded", "hits", "awarded", "expected", "similarity")
+
+
+class _Entry:
+    def __init__(self, state):
+        self.state = state
+        self.watermark = 0
+        self.schemes = {}  # scheme_id -> aggregate row
+        self.computed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def apply(self, rows):
+        for row in rows:
+            current = self.schemes.get(row["scheme_id"])
+            if current is None:
+                self.schemes[row["scheme_id"]] = {k: v for k, v in row.items() if k != "last_outcome"}
+            else:
+                for key in _SUMS:
+                    current[key] = (current[key] or 0) + (row[key] or 0)
+            self.watermark = max(self.watermark, row["last_outcome"])
+
+
+class DifficultyCache:
+    """
+    Per-worker cache of per-scheme outcome aggregates for each (class, exam).
+    A request only reads result_scheme rows added since the previous one.
+    """
+
+    def __init__(self, max_entries=DIFFICULTY_CACHE_ENTRIES, full_refresh=DIFFICULTY_FULL_REFRESH):
+        self.max_entries = max_entries
+        self.full_refresh = full_refresh
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, key, state):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.state != state or time.monotonic() - entry.computed_at > self.full_refresh:
+                entry = self._entries[key] = _Entry(state)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    def report(self, cursor, class_id, exam_id):
+        state = tuple(versions.get(resource) for resource in DEPENDS_ON)
+        entry = self._entry((class_id, exam_id), state)
+        with entry.lock:
+            cursor.execute(_OUTCOMES_QUERY, (exam_id, class_id, entry.watermark))
+            entry.apply(cursor.fetchall())
+            return build_report(entry.schemes.values())
+
+
+def _ratio(part, whole, digits=2):
+    return round(float(part) / float(whole), digits) if whole else 0.0
+
+
+def build_report(scheme_rows):
+    """Questions in id order, each with its schemes; the schemes missed most often first."""
+    questions = {}
+    for row in scheme_rows:
+        question = questions.setdefault(row["question_id"], {
+            "question_id": row["question_id"],
+            "question_text": row["question_text"],
+            "total_marks": row["total_marks"],
+            "scripts_graded": 0,
+            "awarded": 0.0,
+            "schemes": [],
+        })
+        # a script graded on any scheme of the question counts; with the
+        # default of grading every scheme all of them have the same count
+        question["scripts_graded"] = max(question["scripts_graded"], int(row["graded"]))
+        question["awarded"] += float(row["awarded"] or 0)
+        question["schemes"].append({
+            "scheme_id": row["scheme_id"],
+            "scheme_text": row["scheme_text"],
+            "graded": int(row["graded"]),
+            "hit_rate": _ratio(row["hits"], row["graded"]),
+            "average_awarded": _ratio(row["awarded"], row["graded"]),
+            "marks": _ratio(row["expected"], row["graded"]),
+            "average_similarity": _ratio(row["similarity"], row["graded"], 1),
+        })
+
+    report = []
+    for question_id in sorted(questions):
+        question = questions[question_id]
+        question["average_marks"] = _ratio(question.pop("awarded"), question["scripts_graded"])
+        question["schemes"].sort(key=lambda s: (s["hit_rate"], s["scheme_id"]))
+        report.append(question)
+    return report
+
+
+difficulty_cache = DifficultyCache()
@@ -0,0 +1,102 @@
+import re
+from dataclasses import dataclass, field
+from typing import List
+
+# Matches every opening tag (<Question 1 marks="5">, <Scheme 2 marks=1>) and
+# closing tag (</Question 1>, </Scheme 2>) of the exam markup in one pass.
+TAG_PATTERN = re.compile(
+    r'<(?:'
+    r'/\s*(?P<close_kind>Question|Scheme)\s*(?P<close_no>\d+)\s*'
+    r'|(?P<kind>Question|Scheme)\s*(?P<no>\d+)\s*marks\s*=\s*"?(?P<marks>[^">]*?)"?\s*'
+    r')>',
+    re.IGNORECASE
+)
+
+
+def _parse_marks(value):
+    marks = float(value.strip())
+    return int(marks) if marks.is_integer() else marks
+
+
+@dataclass
+class ParsedScheme:
+    scheme_no: int
+    scheme_text: str
+    marks: float
+    start: int
+    end: int
+
+    def to_dict(self):
+        return {"scheme_no": self.scheme_no, "scheme_text": self.scheme_text, "marks": self.marks}
+
+
+@dataclass
+class ParsedQuestion:
+    question_no: int
+    question_text: str
+    marks: float
+    start: int
+    end: int = -1
+    schemes: List[ParsedScheme] = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "question_no": self.question_no,
+            "question_text": self.question_text,
+            "marks": self.marks,
+            "schemes": [s.to_dict() for s in self.schemes]
+        }
+
+
+def parse_exam_markup(text):
+    """
+    Parses <Question N marks=..>..</Question N> and <Scheme N marks=..>..</Scheme N>
+    markup in a single linear scan over the tags.
+
+    A scheme belongs to the question block it appears in, i.e. everything from a
+    question's opening tag up to the next question's opening tag. Tags without a
+    matching closing tag are ignored. `start`/`end` are offsets into `text`.
+    """
+    questions = []
+    block = None        # question whose block we are in (open or already closed)
+    open_question = None
+    open_scheme = None  # (no, marks, start, text_start)
+
+    for m in TAG_PATTERN.finditer(text):
+        kind = m.group("kind")
+        if kind:
+            if kind.lower() == "question":
+                block = open_question = ParsedQuestion(
+                    question_no=int(m.group("no")),
+                    question_text="",
+                    marks=_parse_marks(m.group("marks")),
+                    start=m.start()
+                )
+                # remember where the question text starts until its closing tag shows up
+                open_question.end = m.end()
+                open_scheme = None
+            else:
+                open_scheme = (int(m.group("no")), _parse_marks(m.group("marks")), m.start(), m.end())
+            continue
+
+        close_kind = m.group("close_kind").lower()
+        close_no = int(m.group("close_no"))
+        if close_kind == "question":
+            if open_question is not None and open_question.question_no == close_no:
+                open_question.question_text = text[open_question.end:m.start()].strip()
+                open_question.end = m.end()
+                questions.append(open_question)
+                open_question = None
+        elif open_scheme is not None and open_scheme[0] == close_no:
+            s_no, s_marks, s_start, s_text_start = open_scheme
+            if block is not None:
+                block.schemes.append(ParsedScheme(
+                    scheme_no=s_no,
+                    scheme_text=text[s_text_start:m.start()].strip(),
+                    marks=s_marks,
+                    start=s_start,
+                    end=m.end()
+                ))
+            open_scheme = None
+
+    return questions
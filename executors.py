@@ -0,0 +1,131 @@
+import asyncio
+import inspect
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.routing import APIRoute
+
+# Sync handlers of each router group run on their own thread pool instead of the
+# single threadpool FastAPI shares between all of them, so slow analytics queries
+# or a stuck SMTP server can only exhaust their own group's threads.
+POOL_SIZES = {
+    "auth": int(os.getenv("POOL_AUTH_THREADS", "8")),
+    "crud": int(os.getenv("POOL_CRUD_THREADS", "20")),
+    "analytics": int(os.getenv("POOL_ANALYTICS_THREADS", "4")),
+    "notifications": int(os.getenv("POOL_NOTIFICATIONS_THREADS", "4")),
+    "ocr": int(os.getenv("POOL_OCR_THREADS", "8")),
+}
+
+_current = threading.local()
+
+
+def current_pool():
+    """Name of the bulkhead pool running the calling thread, None outside of them."""
+    return getattr(_current, "pool", None)
+
+
+class BulkheadPool:
+    """A thread pool that also tracks its queue depth and how long calls waited for a thread."""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self._executor = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix=f"pool-{self.name}")
+        return self._executor
+
+    def _call(self, submitted_at, fn, args, kwargs):
+        _current.pool = self.name
+        wait = time.perf_counter() - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            self.queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._call, time.perf_counter(), fn, args, kwargs)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "threads": self.size,
+                "running": self.running,
+                "queued": self.queued,
+                "completed": self.completed,
+                "avg_wait_ms": round(self.total_wait / self.completed * 1000, 2) if self.completed else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+pools = {name: BulkheadPool(name, size) for name, size in POOL_SIZES.items()}
+
+
+async def run_in_pool(name, fn, *args, **kwargs):
+    return await pools[name].run(fn, *args, **kwargs)
+
+
+def pool_stats():
+    return {name: pool.stats() for name, pool in pools.items()}
+
+
+def shutdown_pools():
+    for pool in pools.values():
+        pool.shutdown()
+
+
+def bulkhead_route(pool_name):
+    """
+    Route class for an APIRouter whose sync endpoints should run on `pool_name`:
+        router = APIRouter(prefix=..., route_class=bulkhead_route("crud"))
+    Async endpoints are left alone.
+    """
+
+    class BulkheadRoute(APIRoute):
+        def __init__(self, path, endpoint, **kwargs):
+            if not asyncio.iscoroutinefunction(endpoint):
+                sync_endpoint = endpoint
+
+                async def endpoint(*args, **kw):
+                    return await run_in_pool(pool_name, sync_endpoint, *args, **kw)
+
+                # Expose the original parameters to FastAPI without a __wrapped__
+                # link, which would make it treat the wrapper as sync again.
+                endpoint.__signature__ = inspect.signature(sync_endpoint)
+                endpoint.__name__ = sync_endpoint.__name__
+                endpoint.__qualname__ = sync_endpoint.__qualname__
+                endpoint.__doc__ = sync_endpoint.__doc__
+                endpoint.__module__ = sync_endpoint.__module__
+
+            super().__init__(path, endpoint, **kwargs)
+
+    BulkheadRoute.__name__ = f"BulkheadRoute_{pool_name}"
+    return BulkheadRoute
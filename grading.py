@@ -0,0 +1,177 @@
+import datetime
+import os
+import time
+from database import get_connection
+from executors import run_in_pool
+from ocr import ocr_image, preprocess_image
+
+# token_set_ratio at or above this counts a scheme point as present in the answer
+SIMILARITY_THRESHOLD = int(os.getenv("SIMILARITY_THRESHOLD", "80"))
+
+
+def load_exam_schemes(cursor, exam_id):
+    """Every scheme of an exam, in question order, shaped like the schemes_json the app sends."""
+    cursor.execute("""
+        SELECT s.Scheme_ID AS scheme_id, s.Scheme_Text AS scheme_text, s.Marks AS marks
+        FROM scheme s
+        JOIN question q ON s.Question_ID = q.Question_ID
+        WHERE q.Exam_ID = %s
+        ORDER BY q.Question_ID ASC, s.Scheme_ID ASC
+    """, (exam_id,))
+    return cursor.fetchall()
+
+
+def cached_ocr_text(content_hash):
+    conn = get_connection()
+    if not conn:
+        return None
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT OCR_Text FROM ocr_cache WHERE Content_Hash = %s", (content_hash,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        print(f"[DEBUG] OCR cache lookup failed: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def store_ocr_text(content_hash, text):
+    conn = get_connection()
+    if not conn:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT IGNORE INTO ocr_cache (Content_Hash, OCR_Text, Created_At) VALUES (%s, %s, %s)
+        """, (content_hash, text, datetime.datetime.now()))
+        conn.commit()
+    except Exception as e:
+        print(f"[DEBUG] Could not cache OCR text: {e}")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+async def read_answer_text(upload):
+    """
+    OCR text of an answer photo (a SpooledUpload), lower-cased for grade_text.
+    Text is cached by the image's sha256, so a re-sent image isn't OCR'd again.
+    """
+    print(f"[DEBUG] Received file size: {upload.size} bytes, sha256={upload.sha256}")
+    cached = await run_in_pool("crud", cached_ocr_text, upload.sha256)
+    if cached is not None:
+        print("[DEBUG] OCR text served from cache")
+        return cached
+
+    # Rotate, shrink and recompress off the event loop before paying for OCR
+    contents, prep = await run_in_pool("ocr", preprocess_image, upload.view())
+    contents = bytes(contents)
+    print(f"[DEBUG] Pre-processed image: {prep['original_bytes']} -> {prep['processed_bytes']} bytes "
+          f"({prep.get('original_size')} -> {prep.get('processed_size')}) in {prep['elapsed_ms']:.1f} ms")
+
+    ocr_start = time.perf_counter()
+    extracted_text = (await run_in_pool("ocr", ocr_image, contents)).lower().strip()
+    print(f"[DEBUG] OCR took {(time.perf_counter() - ocr_start) * 1000:.1f} ms")
+    print("----- Extracted Text -----")
+    print(extracted_text)
+    print("--------------------------")
+    await run_in_pool("crud", store_ocr_text, upload.sha256, extracted_text)
+    return extracted_text
+
+
+def grade_text(extracted_text, schemes, verbose=True):
+    """
+    Fuzzy-matches each scheme against the lines of an OCR'd answer and awards
+    its marks when a line is similar enough. `extracted_text` is expected
+    lower-cased, as /api_scan/upload produces it. verbose=False drops the
+    per-scheme debug output (bulk regrades).
+    """
+    from fuzzywuzzy import fuzz  # only loaded by workers that actually grade scripts
+
+    results = []
+    total_marks = 0
+    total_possible_marks = sum(scheme.get("marks", 0) for scheme in schemes)
+    lines = [line.strip() for line in extracted_text.splitlines() if line.strip()]
+
+    for scheme in schemes:
+        scheme_id = scheme.get("scheme_id")
+        scheme_text = scheme.get("scheme_text", "").lower().strip()
+        scheme_marks = scheme.get("marks", 0)
+
+        matched = False
+        highest_similarity = 0
+
+        for line in lines:
+            sim = fuzz.token_set_ratio(scheme_text, line)
+            if sim > highest_similarity:
+                highest_similarity = sim
+            if sim >= SIMILARITY_THRESHOLD:
+                matched = True
+                break
+
+        mark_awarded = scheme_marks if matched else 0
+        total_marks += mark_awarded
+
+        if verbose:
+            print(f"[DEBUG] Scheme ID: {scheme_id}")
+            print(f"        Scheme Text: {scheme_text}")
+            print(f"        Expected Marks: {scheme_marks}")
+            print(f"        Highest Similarity: {highest_similarity}")
+            print(f"        Matched: {matched}")
+            print(f"        Marks Awarded: {mark_awarded}")
+            print("----------------------------")
+
+        results.append({
+            "scheme_id": scheme_id,
+            "scheme_text": scheme_text,
+            "expected_marks": scheme_marks,
+            "awarded_marks": mark_awarded,
+            "similarity": highest_similarity
+        })
+
+    if verbose:
+        print(f"[DEBUG] Total Marks Awarded: {total_marks}")
+
+    return {
+        "results": results,
+        "total_awarded_marks": total_marks,
+        "total_possible_marks": total_possible_marks
+    }
+
+
+def score_value(score):
+    """The numeric value of a text score like "7" or "7.5", None when it isn't one."""
+    try:
+        return float(score)
+    except (TypeError, ValueError):
+        return None
+
+
+def outcome_rows(result_id, outcomes):
+    """result_scheme rows for the per-scheme entries of grade_text (or the app's copy of them)."""
+    return [
+        (result_id, o["scheme_id"], round(o.get("similarity", 0)), o.get("awarded_marks", 0), o.get("expected_marks", 0))
+        for o in outcomes
+    ]
+
+
+def save_outcomes(cursor, rows):
+    """Bulk-inserts rows built by outcome_rows; part of the caller's transaction."""
+    if rows:
+        cursor.executemany("""
+            INSERT INTO result_scheme (Result_ID, Scheme_ID, Similarity, Awarded_Marks, Expected_Marks)
+            VALUES (%s, %s, %s, %s, %s)
+        """, rows)
+
+
+def summarize(grading):
+    """Plain-text summary stored with a result, one line per scheme."""
+    lines = [
+        f"{r['scheme_id']}: {r['awarded_marks']}/{r['expected_marks']} (similarity {r['similarity']})"
+        for r in grading["results"]
+    ]
+    lines.append(f"Total: {grading['total_awarded_marks']}/{grading['total_possible_marks']}")
+    return "\n".join(lines)
@@ -0,0 +1,154 @@
+import datetime
+import hashlib
+import os
+import random
+import secrets
+import orjson
+from fastapi import HTTPException
+from mysql.connector import IntegrityError, errorcode
+from database import get_connection
+from executors import run_in_pool
+from serialization import FastJSONResponse, dumps
+
+# How long a key's response is kept for replay. Clients retry within seconds;
+# a day covers an app that was killed mid-request and reopened later.
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+# How long a request holds its key while it runs. A retry after that takes the
+# key over, so a worker that died mid-request doesn't block it for the full TTL.
+IDEMPOTENCY_LEASE = int(os.getenv("IDEMPOTENCY_LEASE", "300"))
+IDEMPOTENCY_KEY_MAX = 64
+# share of claims that also clear out a few expired keys
+IDEMPOTENCY_PURGE_RATE = 0.01
+
+HEADER = "idempotency-key"
+
+
+def fingerprint(*parts):
+    """Hash of what a request asks for, so a key can't be reused for a different request."""
+    return hashlib.sha256(dumps(parts)).hexdigest()
+
+
+def _connection():
+    conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="DB connection failed")
+    return conn
+
+
+def _claim(key, endpoint, request_hash):
+    """
+    Claims the key for this request with a lease. Returns (lease_token, None)
+    when the request should run, or (None, (status, body)) when the key was
+    already used for this request and has completed.
+    """
+    conn = _connection()
+    cursor = conn.cursor(dictionary=True)
+    now = datetime.datetime.now()
+    token = secrets.token_hex(16)
+    locked_until = now + datetime.timedelta(seconds=IDEMPOTENCY_LEASE)
+    try:
+        if random.random() < IDEMPOTENCY_PURGE_RATE:
+            cursor.execute("DELETE FROM idempotency_key WHERE Expires_At < %s LIMIT 100", (now,))
+        for _ in range(2):
+            try:
+                cursor.execute("""
+                    INSERT INTO idempotency_key
+                        (Idem_Key, Endpoint, Request_Hash, Created_At, Expires_At, Locked_Until, Lease_Token)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, (key, endpoint, request_hash, now, now + datetime.timedelta(seconds=IDEMPOTENCY_TTL),
+                      locked_until, token))
+                conn.commit()
+                return token, None
+            except IntegrityError as e:
+                conn.rollback()
+                if e.errno != errorcode.ER_DUP_ENTRY:
+                    raise
+
+            cursor.execute("""
+                SELECT Request_Hash, Status_Code, Response, Expires_At, Locked_Until
+                FROM idempotency_key WHERE Idem_Key = %s AND Endpoint = %s
+            """, (key, endpoint))
+            row = cursor.fetchone()
+            if row is None:
+                continue  # released in between, try to claim it again
+            if row["Expires_At"] < now:
+                cursor.execute("DELETE FROM idempotency_key WHERE Idem_Key = %s AND Endpoint = %s", (key, endpoint))
+                conn.commit()
+                continue
+            if row["Request_Hash"] != request_hash:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            if row["Status_Code"] is not None:
+                return None, (row["Status_Code"], row["Response"])
+            if row["Locked_Until"] is None or row["Locked_Until"] < now:
+                # the holder's lease lapsed: take the key over unless another retry just did
+                cursor.execute("""
+                    UPDATE idempotency_key SET Locked_Until = %s, Lease_Token = %s
+                    WHERE Idem_Key = %s AND Endpoint = %s AND Status_Code IS NULL
+                      AND (Locked_Until IS NULL OR Locked_Until < %s)
+                """, (locked_until, token, key, endpoint, now))
+                conn.commit()
+                if cursor.rowcount == 1:
+                    return token, None
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _complete(key, endpoint, token, status_code, body):
+    """Stores the response, unless the lease was lost to a retry that is now running it."""
+    conn = _connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE idempotency_key SET Status_Code = %s, Response = %s, Locked_Until = NULL
+            WHERE Idem_Key = %s AND Endpoint = %s AND Lease_Token = %s
+        """, (status_code, body, key, endpoint, token))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _release(key, endpoint, token):
+    conn = _connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            DELETE FROM idempotency_key
+            WHERE Idem_Key = %s AND Endpoint = %s AND Lease_Token = %s AND Status_Code IS NULL
+        """, (key, endpoint, token))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+async def idempotent(request, request_hash, call):
+    """
+    Runs `await call()` once per Idempotency-Key header value and endpoint.
+    Retries with the same key get the first response replayed, with an
+    Idempotent-Replayed header. Failed calls release the key so it can be
+    retried, and a key whose request died without releasing it can be taken
+    over once its lease lapses. Requests without the header just run.
+    """
+    key = request.headers.get(HEADER)
+    if not key:
+        return await call()
+    if len(key) > IDEMPOTENCY_KEY_MAX:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key longer than {IDEMPOTENCY_KEY_MAX} characters")
+
+    endpoint = request.url.path
+    token, stored = await run_in_pool("crud", _claim, key, endpoint, request_hash)
+    if stored is not None:
+        status_code, body = stored
+        return FastJSONResponse(orjson.loads(body), status_code=status_code, headers={"Idempotent-Replayed": "true"})
+
+    try:
+        result = await call()
+    except BaseException:
+        await run_in_pool("crud", _release, key, endpoint, token)
+        raise
+    await run_in_pool("crud", _complete, key, endpoint, token, 200, dumps(result).decode())
+    return result
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+
+# Identifiers (emails / phone numbers) that matched no lecturer are remembered
+# for a short while so repeated logins with unknown identifiers (credential
+# stuffing, typos retried by the app) don't each cost a database round trip.
+# Each worker has its own cache: after a registration on another worker an
+# identifier can be reported unknown here for at most NEGATIVE_CACHE_TTL seconds.
+NEGATIVE_CACHE_TTL = float(os.getenv("IDENTITY_NEGATIVE_CACHE_TTL", "30"))
+NEGATIVE_CACHE_MAX = int(os.getenv("IDENTITY_NEGATIVE_CACHE_MAX", "10000"))
+
+_unknown = {}  # ("email" | "phone", value) -> expires_at
+_lock = threading.Lock()
+
+DEFAULT_COLUMNS = ("lecturer_id", "email", "phone_number", "password")
+
+
+def _is_unknown(keys):
+    now = time.monotonic()
+    with _lock:
+        return all(_unknown.get(key, 0) > now for key in keys)
+
+
+def _remember_unknown(keys):
+    now = time.monotonic()
+    with _lock:
+        if len(_unknown) >= NEGATIVE_CACHE_MAX:
+            for key in [k for k, expires_at in _unknown.items() if expires_at <= now]:
+                del _unknown[key]
+            if len(_unknown) >= NEGATIVE_CACHE_MAX:
+                _unknown.clear()
+        for key in keys:
+            _unknown[key] = now + NEGATIVE_CACHE_TTL
+
+
+def forget_unknown(email=None, phone=None):
+    """Call after an email/phone number starts belonging to a lecturer."""
+    with _lock:
+        if email:
+            _unknown.pop(("email", email), None)
+        if phone:
+            _unknown.pop(("phone", phone), None)
+
+
+def find_lecturer(cursor, email=None, phone=None, columns=DEFAULT_COLUMNS):
+    """
+    Returns the lecturer row matching the email or the phone number (email wins),
+    or None. Each identifier is an indexed point lookup; with both given they
+    are combined with UNION ALL instead of an OR that can't use either index.
+    `cursor` should be a dictionary cursor.
+    """
+    keys = [("email", email)] if email else []
+    if phone:
+        keys.append(("phone", phone))
+    if not keys:
+        return None
+    if _is_unknown(keys):
+        return None
+
+    cols = ", ".join(columns)
+    lookups = []
+    params = []
+    if email:
+        lookups.append(f"(SELECT {cols} FROM lecturer WHERE Email = %s LIMIT 1)")
+        params.append(email)
+    if phone:
+        lookups.append(f"(SELECT {cols} FROM lecturer WHERE Phone_Number = %s LIMIT 1)")
+        params.append(phone)
+
+    cursor.execute(" UNION ALL ".join(lookups) + " LIMIT 1", tuple(params))
+    row = cursor.fetchone()
+    if row is None:
+        _remember_unknown(keys)
+    return row
+
+
+def existing_identifiers(cursor, email, phone):
+    """Returns (email_taken, phone_taken), bypassing the negative cache."""
+    cursor.execute("""
+        SELECT
+            EXISTS(SELECT 1 FROM lecturer WHERE Email = %s) AS email_taken,
+            EXISTS(SELECT 1 FROM lecturer WHERE Phone_Number = %s) AS phone_taken
+    """, (email, phone))
+    row = cursor.fetchone()
+    if isinstance(row, dict):
+        return bool(row["email_taken"]), bool(row["phone_taken"])
+    return bool(row[0]), bool(row[1])
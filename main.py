@@ -1,8 +1,97 @@
+import importlib
+import os
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 # from fastapi.middleware.cors import CORSMiddleware
-from routes import auth, register, db_class, db_student, db_exam, db_question, db_scheme, db_result, db_homepage, db_scan, db_submission, db_analytics, db_profile, db_password  # your routers
+from rate_limit import RateLimitMiddleware
+from compression import CompressionMiddleware
+from uploads import BodySizeLimitMiddleware
+from serialization import FastJSONResponse
+from executors import pool_stats, shutdown_pools
+import response_cache
+import database
+import exam_parser
+import ocr
+import passwords
+from notifications import get_dispatcher, shutdown_dispatcher
 
-app = FastAPI()
+# Routers in routes/, in registration order. ENABLED_ROUTERS (comma separated)
+# lets a deployment run workers that only load some of them, e.g. CRUD-only
+# workers that never import the OCR stack.
+ROUTERS = [
+    "auth", "register", "db_class", "db_student", "db_exam", "db_question", "db_scheme", "db_result",
+    "db_homepage", "db_scan", "db_submission", "db_analytics", "db_profile", "db_password", "db_image",
+]
+ENABLED_ROUTERS = [name.strip() for name in os.getenv("ENABLED_ROUTERS", ",".join(ROUTERS)).split(",") if name.strip()]
+
+routers = {name: importlib.import_module(f"routes.{name}") for name in ENABLED_ROUTERS}
+
+def uses(*names):
+    return any(name in routers for name in names)
+
+# name -> (warm-up step, whether the worker needs it to serve traffic)
+WARM_UP_STEPS = {
+    "database_pool": (database.init_pool, True),
+}
+if uses("db_exam", "db_scan", "db_submission"):
+    WARM_UP_STEPS["ocr_client"] = (ocr.ocr_client.get, False)
+    WARM_UP_STEPS["exam_parser"] = (lambda: exam_parser.parse_exam_markup('<Question 1 marks="1">q</Question 1>'), False)
+if uses("auth", "register", "db_password"):
+    WARM_UP_STEPS["password_workers"] = (passwords.warm_up, False)
+if uses("db_password"):
+    WARM_UP_STEPS["otp_store"] = (lambda: routers["db_password"].otp_store.start(), False)
+    WARM_UP_STEPS["notifications"] = (lambda: get_dispatcher().start(), False)
+
+def warm_up():
+    results = {}
+    for name, (step, required) in WARM_UP_STEPS.items():
+        start = time.perf_counter()
+        try:
+            step()
+            results[name] = {"ok": True}
+        except Exception as e:
+            print(f"Warm-up step {name} failed: {e}")
+            results[name] = {"ok": False, "error": str(e)}
+        results[name]["required"] = required
+        results[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        print(f"Warm-up {name}: {'ok' if results[name]['ok'] else 'FAILED'} ({results[name]['ms']} ms)")
+    return results
+
+def tear_down():
+    for name, step in [
+        ("notifications", shutdown_dispatcher),
+        ("otp_store", lambda: routers["db_password"].otp_store.stop() if uses("db_password") else None),
+        ("password_workers", passwords.shutdown_pool),
+        ("ocr", ocr.shutdown),
+        ("executors", shutdown_pools),
+        ("database_pool", database.close_pool),
+    ]:
+        try:
+            step()
+        except Exception as e:
+            print(f"Shutdown step {name} failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    app.state.warm_up = {}
+    print_routes()
+    app.state.warm_up = warm_up()
+    app.state.ready = all(r["ok"] for r in app.state.warm_up.values() if r["required"])
+    yield
+    app.state.ready = False
+    tear_down()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# Token-bucket limits per client IP, weighted by endpoint cost
+app.add_middleware(RateLimitMiddleware)
+# gzip/brotli for large responses; wraps everything that builds a response body
+app.add_middleware(CompressionMiddleware)
+# 413 for oversized request bodies before anything reads them; outermost
+app.add_middleware(BodySizeLimitMiddleware)
 
 # app.add_middleware(
 #     CORSMiddleware,
@@ -12,26 +101,37 @@ app = FastAPI()
 #     allow_headers=["*"],
 # )
 
-app.include_router(auth.router)
-app.include_router(register.router)
-app.include_router(db_class.router)
-app.include_router(db_student.router)
-app.include_router(db_exam.router)
-app.include_router(db_question.router)
-app.include_router(db_scheme.router)
-app.include_router(db_result.router)
-app.include_router(db_homepage.router)
-app.include_router(db_scan.router)
-app.include_router(db_submission.router)
-app.include_router(db_analytics.router)
-app.include_router(db_profile.router)
-app.include_router(db_password.router)
+for router_module in routers.values():
+    app.include_router(router_module.router)
 
 @app.get("/")
 def read_root():
     return {"message": "FastAPI is working!"}
 
-@app.on_event("startup")
+@app.get("/metrics/pools")
+def get_pool_metrics():
+    # queue depth and thread wait time of each router group's pool
+    return {"success": True, "data": pool_stats()}
+
+@app.get("/metrics/ocr")
+def get_ocr_metrics():
+    # latency of Vision calls made through this worker's shared client
+    return {"success": True, "data": ocr.ocr_client.stats()}
+
+@app.get("/metrics/cache")
+def get_cache_metrics():
+    # hits, misses and 304s of this worker's response cache
+    return {"success": True, "data": response_cache.cache.stats()}
+
+@app.get("/ready")
+def readiness():
+    # 503 until the shared resources are warmed up, so the load balancer holds traffic back
+    status_code = 200 if getattr(app.state, "ready", False) else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={"ready": status_code == 200, "steps": getattr(app.state, "warm_up", {})}
+    )
+
 def print_routes():
     print("Registered routes:")
     for route in app.routes:
@@ -0,0 +1,5 @@
+-- Point lookups for login / password reset, and duplicate detection for /register.
+-- Fails if the table already holds duplicate emails or phone numbers; clean those up first.
+ALTER TABLE lecturer
+    ADD UNIQUE INDEX uq_lecturer_email (Email),
+    ADD UNIQUE INDEX uq_lecturer_phone (Phone_Number);
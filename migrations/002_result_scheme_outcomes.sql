@@ -0,0 +1,26 @@
+-- Structured grading results: numeric totals on result, and one row per graded
+-- scheme in result_scheme, so question/scheme analytics can be done in SQL
+-- instead of parsing Score/Summary text.
+ALTER TABLE result
+    ADD COLUMN Awarded_Marks DOUBLE NULL,
+    ADD COLUMN Possible_Marks DOUBLE NULL;
+
+-- Existing rows only have the text score; keep whatever of it is numeric.
+UPDATE result
+SET Awarded_Marks = CAST(Score AS DECIMAL(10, 2))
+WHERE Score REGEXP '^[0-9]+(\\.[0-9]+)?$';
+
+-- No foreign keys: result and scheme rows are deleted by the app without
+-- cascades today, and analytics join back to scheme anyway.
+CREATE TABLE IF NOT EXISTS result_scheme (
+    Outcome_ID BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    Result_ID VARCHAR(10) NOT NULL,
+    Scheme_ID VARCHAR(10) NOT NULL,
+    Similarity TINYINT UNSIGNED NOT NULL,
+    Awarded_Marks DOUBLE NOT NULL,
+    Expected_Marks DOUBLE NOT NULL,
+    PRIMARY KEY (Outcome_ID),
+    UNIQUE INDEX uq_result_scheme (Result_ID, Scheme_ID),
+    -- covers per-scheme aggregates without touching the rows
+    INDEX idx_result_scheme_scheme (Scheme_ID, Awarded_Marks, Expected_Marks, Similarity)
+) ENGINE=InnoDB;
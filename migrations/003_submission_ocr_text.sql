@@ -0,0 +1,4 @@
+-- OCR text of each answer script, so results can be regraded after a rubric
+-- change without sending the photos through Vision again.
+ALTER TABLE answer_submission
+    ADD COLUMN OCR_Text MEDIUMTEXT NULL;
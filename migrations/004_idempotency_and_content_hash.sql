@@ -0,0 +1,27 @@
+-- Replayable responses for requests sent with an Idempotency-Key header.
+-- Status_Code stays NULL while the first request is still running.
+CREATE TABLE IF NOT EXISTS idempotency_key (
+    Idem_Key VARCHAR(64) NOT NULL,
+    Endpoint VARCHAR(64) NOT NULL,
+    Request_Hash CHAR(64) NOT NULL,
+    Status_Code SMALLINT NULL,
+    Response MEDIUMTEXT NULL,
+    Created_At DATETIME NOT NULL,
+    Expires_At DATETIME NOT NULL,
+    PRIMARY KEY (Idem_Key, Endpoint),
+    INDEX idx_idempotency_expires (Expires_At)
+) ENGINE=InnoDB;
+
+-- sha256 of the uploaded script image. The same image can be recorded only once
+-- per student and exam; rows without a hash (older clients) are not affected.
+ALTER TABLE answer_submission
+    ADD COLUMN Content_Hash CHAR(64) NULL,
+    ADD UNIQUE INDEX uq_submission_content (Student_ID, Exam_ID, Content_Hash);
+
+-- OCR text by image hash, so a re-sent image isn't paid for twice.
+CREATE TABLE IF NOT EXISTS ocr_cache (
+    Content_Hash CHAR(64) NOT NULL,
+    OCR_Text MEDIUMTEXT NOT NULL,
+    Created_At DATETIME NOT NULL,
+    PRIMARY KEY (Content_Hash)
+) ENGINE=InnoDB;
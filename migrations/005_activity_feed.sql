@@ -0,0 +1,25 @@
+-- Lecturer_ID copied onto submissions and exams, so a lecturer's recent activity
+-- is an index range scan per table instead of a join through student and class.
+-- The app fills these on insert (and when a student moves class).
+ALTER TABLE answer_submission
+    ADD COLUMN Lecturer_ID VARCHAR(10) NULL,
+    ADD INDEX idx_submission_lecturer_time (Lecturer_ID, Timestamp, Submission_ID);
+
+UPDATE answer_submission a
+JOIN student s ON s.Student_ID = a.Student_ID
+JOIN class c ON c.Class_ID = s.Class_ID
+SET a.Lecturer_ID = c.Lecturer_ID;
+
+-- Created_At stays NULL for existing exams (their creation time was never
+-- recorded); they just don't appear in the feed.
+ALTER TABLE exam
+    ADD COLUMN Lecturer_ID VARCHAR(10) NULL,
+    ADD COLUMN Created_At DATETIME NULL,
+    ADD INDEX idx_exam_lecturer_created (Lecturer_ID, Created_At, Exam_ID);
+
+UPDATE exam e
+JOIN class c ON c.Class_ID = e.Class_ID
+SET e.Lecturer_ID = c.Lecturer_ID;
+
+-- Result of a submission, looked up per feed entry.
+CREATE INDEX idx_result_submission ON result (Submission_ID);
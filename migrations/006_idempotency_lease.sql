@@ -0,0 +1,7 @@
+-- In-progress Idempotency-Key claims are leased: once Locked_Until has passed,
+-- a retry may take the key over from a request that crashed or was killed.
+-- Lease_Token identifies the current holder, so a request that lost its
+-- lease can't overwrite or release the key afterwards.
+ALTER TABLE idempotency_key
+    ADD COLUMN Locked_Until DATETIME NULL,
+    ADD COLUMN Lease_Token CHAR(32) NULL;
@@ -0,0 +1,200 @@
+import os
+import queue
+import smtplib
+import socket
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# "live" sends through Gmail SMTP / UltraMsg, "local" only records messages (tests, dev)
+NOTIFY_TRANSPORT = os.getenv("NOTIFY_TRANSPORT", "live")
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "1000"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "3"))
+NOTIFY_RETRY_BACKOFF = float(os.getenv("NOTIFY_RETRY_BACKOFF", "1.0"))
+
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 587
+
+_STOP = object()
+
+
+class SMTPTransport:
+    """Keeps one logged-in SMTP connection open and reconnects when the server drops it."""
+
+    def __init__(self, sender, password, host=SMTP_HOST, port=SMTP_PORT):
+        self.sender = sender
+        self.password = password
+        self.host = host
+        self.port = port
+        self._server = None
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=15)
+        server.starttls()
+        server.login(self.sender, self.password)
+        self._server = server
+
+    def send_email(self, to, subject, body):
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = to
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+
+        for attempt in range(2):
+            if self._server is None:
+                self._connect()
+            try:
+                self._server.send_message(msg)
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout):
+                # idle connections get closed by Gmail; reconnect once straight away.
+                # Other SMTPExceptions are OSErrors too, but a rejected message
+                # won't go through on a new connection, so those aren't caught here.
+                self.close()
+                if attempt == 1:
+                    raise
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+
+class WhatsAppTransport:
+    """Sends through UltraMsg over a keep-alive HTTP session."""
+
+    def __init__(self, instance_id, token):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = f"https://api.ultramsg.com/{instance_id}/messages/chat"
+        self.token = token
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+    def send_whatsapp(self, to, body):
+        response = self.session.post(self.url, data={"token": self.token, "to": to, "body": body}, timeout=15)
+        response.raise_for_status()
+
+    def close(self):
+        self.session.close()
+
+
+class LocalTransport:
+    """Stand-in for both channels that keeps messages in memory instead of sending them."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_email(self, to, subject, body):
+        print(f"[LOCAL EMAIL] to={to} subject={subject!r} body={body!r}")
+        self.sent.append(("email", to, body))
+
+    def send_whatsapp(self, to, body):
+        print(f"[LOCAL WHATSAPP] to={to} body={body!r}")
+        self.sent.append(("whatsapp", to, body))
+
+    def close(self):
+        pass
+
+
+class NotificationDispatcher:
+    """
+    Delivers messages from background threads, one per channel so a slow SMTP
+    server doesn't hold up WhatsApp messages. Endpoints only enqueue.
+    Failed deliveries are retried with exponential backoff, then logged.
+    """
+
+    def __init__(self, email_transport, whatsapp_transport,
+                 max_attempts=NOTIFY_MAX_ATTEMPTS, backoff=NOTIFY_RETRY_BACKOFF, queue_size=NOTIFY_QUEUE_SIZE):
+        self.transports = {"email": email_transport, "whatsapp": whatsapp_transport}
+        self.queues = {channel: queue.Queue(maxsize=queue_size) for channel in self.transports}
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            for channel in self.transports:
+                if channel not in self._threads:
+                    thread = threading.Thread(target=self._run, args=(channel,), name=f"notify-{channel}", daemon=True)
+                    thread.start()
+                    self._threads[channel] = thread
+
+    def stop(self, timeout=5):
+        with self._lock:
+            for channel, thread in self._threads.items():
+                try:
+                    self.queues[channel].put(_STOP, timeout=timeout)
+                except queue.Full:
+                    pass
+            for thread in self._threads.values():
+                thread.join(timeout)
+            self._threads = {}
+        for transport in self.transports.values():
+            transport.close()
+
+    def _enqueue(self, channel, args):
+        """Raises queue.Full when the channel is backed up."""
+        self.start()
+        self.queues[channel].put_nowait(args)
+
+    def send_email(self, to, subject, body):
+        self._enqueue("email", (to, subject, body))
+
+    def send_whatsapp(self, to, body):
+        self._enqueue("whatsapp", (to, body))
+
+    def _run(self, channel):
+        transport = self.transports[channel]
+        send = transport.send_email if channel == "email" else transport.send_whatsapp
+        jobs = self.queues[channel]
+        while True:
+            args = jobs.get()
+            if args is _STOP:
+                return
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    send(*args)
+                    break
+                except Exception as e:
+                    print(f"[NOTIFY] {channel} to {args[0]} failed (attempt {attempt}/{self.max_attempts}): {e}")
+                    if attempt < self.max_attempts:
+                        time.sleep(self.backoff * 2 ** (attempt - 1))
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def create_dispatcher(transport=NOTIFY_TRANSPORT):
+    if transport == "local":
+        local = LocalTransport()
+        return NotificationDispatcher(local, local)
+    from secretkey import ULTRAMSG_INSTANCE_ID, ULTRAMSG_TOKEN, EMAIL_SENDER, EMAIL_APP_PASSWORD
+    return NotificationDispatcher(
+        SMTPTransport(EMAIL_SENDER, EMAIL_APP_PASSWORD),
+        WhatsAppTransport(ULTRAMSG_INSTANCE_ID, ULTRAMSG_TOKEN)
+    )
+
+
+def get_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = create_dispatcher()
+        return _dispatcher
+
+
+def shutdown_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is not None:
+            _dispatcher.stop()
+            _dispatcher = None
@@ -0,0 +1,352 @@
+import io
+import mmap
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# google.cloud.vision, pdf2image, Pillow and pypdf are imported on first use so
+# workers that never OCR anything don't pay for loading them.
+
+# Rendering settings tuned for OCR rather than display: grayscale pages at a
+# DPI high enough for small handwriting, rendered a few pages at a time.
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+PDF_RENDER_WINDOW = int(os.getenv("PDF_RENDER_WINDOW", "2"))
+PDF_RENDER_THREADS = int(os.getenv("PDF_RENDER_THREADS", "2"))
+# Pages whose embedded text layer has fewer visible characters than this are
+# treated as scanned and sent to OCR.
+MIN_TEXT_LAYER_CHARS = int(os.getenv("MIN_TEXT_LAYER_CHARS", "20"))
+# Pages are OCR'd concurrently on a pool shared by all requests of this worker.
+# With OCR_BATCH_SIZE > 1 several pages go to Vision in one batch_annotate_images call (max 16).
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "4"))
+OCR_BATCH_SIZE = min(int(os.getenv("OCR_BATCH_SIZE", "1")), 16)
+# Answer photos are shrunk to this longest side before OCR; Vision gains nothing
+# from 12 MP phone photos of a handwritten page.
+OCR_MAX_IMAGE_SIDE = int(os.getenv("OCR_MAX_IMAGE_SIDE", "2048"))
+OCR_JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "85"))
+
+# Service account key of the Vision API, unless GOOGLE_APPLICATION_CREDENTIALS points elsewhere
+SERVICE_KEY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gradingbot_service.json")
+
+_ocr_pool = ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS, thread_name_prefix="ocr")
+
+_DONE = object()
+
+
+def _page_windows(page_numbers, window):
+    """Groups sorted page numbers into contiguous (first, last) runs of at most `window` pages."""
+    runs = []
+    for page_no in page_numbers:
+        if runs and page_no == runs[-1][1] + 1 and page_no - runs[-1][0] < window:
+            runs[-1][1] = page_no
+        else:
+            runs.append([page_no, page_no])
+    return runs
+
+
+def iter_pdf_pages(content, page_numbers=None, dpi=OCR_DPI, window=PDF_RENDER_WINDOW, thread_count=PDF_RENDER_THREADS):
+    """
+    Yields (page_no, png_bytes) for the given 1-based pages of a PDF (all pages by default).
+    The PDF is written to a temp folder once and rendered by a background thread
+    `window` pages at a time, so at most ~2 windows of pages are held in memory
+    and the caller can OCR one page while the next ones are still rendering.
+    """
+    pages = queue.Queue(maxsize=window)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def render():
+        try:
+            with tempfile.TemporaryDirectory(prefix="pdf_pages_") as tmp_dir:
+                from pdf2image import convert_from_path, pdfinfo_from_path
+
+                pdf_path = os.path.join(tmp_dir, "source.pdf")
+                with open(pdf_path, "wb") as f:
+                    f.write(content)
+                wanted = page_numbers
+                if wanted is None:
+                    wanted = range(1, pdfinfo_from_path(pdf_path)["Pages"] + 1)
+
+                for first, last in _page_windows(sorted(wanted), window):
+                    paths = convert_from_path(
+                        pdf_path,
+                        dpi=dpi,
+                        grayscale=True,
+                        fmt="png",
+                        first_page=first,
+                        last_page=last,
+                        thread_count=max(1, min(thread_count, last - first + 1)),
+                        output_folder=tmp_dir,
+                        paths_only=True,
+                    )
+                    for page_no, path in zip(range(first, last + 1), paths):
+                        with open(path, "rb") as f:
+                            data = f.read()
+                        os.remove(path)
+                        if not put((page_no, data)):
+                            return
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    threading.Thread(target=render, daemon=True).start()
+    try:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def _open_stream(content):
+    """File-like object over the content; an mmap-backed memoryview is read in place instead of copied."""
+    if isinstance(content, memoryview) and isinstance(content.obj, mmap.mmap):
+        content.obj.seek(0)
+        return content.obj
+    return io.BytesIO(content)
+
+
+def new_client():
+    from google.cloud import vision
+    os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", SERVICE_KEY_PATH)
+    return vision.ImageAnnotatorClient()
+
+
+def _is_channel_failure(error):
+    from google.api_core import exceptions
+    if isinstance(error, (exceptions.ServiceUnavailable, exceptions.Unauthenticated)):
+        return True
+    # grpc raises this once the channel has been closed underneath the client
+    return isinstance(error, ValueError) and "closed channel" in str(error)
+
+
+class OCRClient:
+    """
+    Holds one Vision client (and so one gRPC channel) per worker, shared by all
+    requests. If a call fails because the channel is broken the client is
+    rebuilt and the call retried once. Keeps call latency stats for /metrics/ocr.
+    """
+
+    def __init__(self, factory=new_client, latency_window=200):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self.calls = 0
+        self.failures = 0
+        self.recreated = 0
+
+    def get(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._factory()
+            return self._client
+
+    def _discard(self, broken):
+        with self._lock:
+            # another thread may already have replaced it
+            if self._client is broken:
+                self._client = None
+                self.recreated += 1
+                try:
+                    broken.transport.close()
+                except Exception:
+                    pass
+
+    def _call(self, method, **kwargs):
+        for attempt in range(2):
+            client = self.get()
+            start = time.perf_counter()
+            try:
+                response = getattr(client, method)(**kwargs)
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                if attempt == 0 and _is_channel_failure(e):
+                    print(f"OCR client failed ({e}), recreating it")
+                    self._discard(client)
+                    continue
+                raise
+            with self._lock:
+                self.calls += 1
+                self._latencies.append(time.perf_counter() - start)
+            return response
+
+    def document_text_detection(self, **kwargs):
+        return self._call("document_text_detection", **kwargs)
+
+    def batch_annotate_images(self, **kwargs):
+        return self._call("batch_annotate_images", **kwargs)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                "connected": self._client is not None,
+                "calls": self.calls,
+                "failures": self.failures,
+                "recreated": self.recreated,
+            }
+        if latencies:
+            stats["avg_ms"] = round(sum(latencies) / len(latencies) * 1000, 1)
+            stats["p95_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1)
+            stats["max_ms"] = round(latencies[-1] * 1000, 1)
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.transport.close()
+                self._client = None
+
+
+ocr_client = OCRClient()
+
+
+def shutdown():
+    _ocr_pool.shutdown(wait=False, cancel_futures=True)
+    ocr_client.close()
+
+
+def ocr_image(content, client=None):
+    from google.cloud import vision
+    client = client or ocr_client
+    image = vision.Image(content=bytes(content))
+    response = client.document_text_detection(image=image)
+    return response.full_text_annotation.text if response.full_text_annotation else ""
+
+
+def preprocess_image(content):
+    """
+    Prepares a photo for OCR: applies the EXIF rotation, converts to grayscale,
+    downscales to OCR_MAX_IMAGE_SIDE and recompresses as JPEG.
+    Returns (image_bytes, metrics). Files Pillow can't decode are passed through untouched.
+    """
+    from PIL import Image, ImageOps
+    start = time.perf_counter()
+    metrics = {"original_bytes": len(content)}
+    data = content
+    try:
+        with Image.open(_open_stream(content)) as img:
+            metrics["original_size"] = img.size
+            rotated = img.getexif().get(0x0112, 1) != 1  # EXIF Orientation tag
+            processed = ImageOps.exif_transpose(img).convert("L")
+            processed.thumbnail((OCR_MAX_IMAGE_SIDE, OCR_MAX_IMAGE_SIDE), Image.LANCZOS)
+            out = io.BytesIO()
+            processed.save(out, format="JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+            metrics["processed_size"] = processed.size
+            # an already small, upright scan can come out bigger as JPEG; keep the original then
+            if rotated or processed.size != img.size or out.tell() < len(content):
+                data = out.getvalue()
+    except Exception as e:
+        print(f"[DEBUG] Image pre-processing skipped: {e}")
+
+    metrics["processed_bytes"] = len(data)
+    metrics["elapsed_ms"] = (time.perf_counter() - start) * 1000
+    return data, metrics
+
+
+def ocr_images(contents, client=None):
+    """OCRs several images with a single Vision batch request, returning the texts in order."""
+    client = client or ocr_client
+    if len(contents) == 1:
+        return [ocr_image(contents[0], client)]
+
+    from google.cloud import vision
+    feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+    requests = [
+        vision.AnnotateImageRequest(image=vision.Image(content=content), features=[feature])
+        for content in contents
+    ]
+    response = client.batch_annotate_images(requests=requests)
+    return [r.full_text_annotation.text if r.full_text_annotation else "" for r in response.responses]
+
+
+def ocr_pages(pages, client=None, batch_size=OCR_BATCH_SIZE):
+    """
+    OCRs an iterable of (page_no, image_bytes) concurrently and returns {page_no: text}.
+    Batches are submitted as soon as the pages arrive; the number of batches in
+    flight is capped so a slow Vision backend can't make rendered pages pile up.
+    """
+    client = client or ocr_client
+    in_flight = threading.BoundedSemaphore(OCR_MAX_WORKERS * 2)
+    futures = []
+
+    def submit(batch):
+        in_flight.acquire()
+        future = _ocr_pool.submit(ocr_images, [content for _, content in batch], client)
+        future.add_done_callback(lambda _: in_flight.release())
+        futures.append(([page_no for page_no, _ in batch], future))
+
+    batch = []
+    for page in pages:
+        batch.append(page)
+        if len(batch) >= batch_size:
+            submit(batch)
+            batch = []
+    if batch:
+        submit(batch)
+
+    texts = {}
+    for page_nos, future in futures:
+        for page_no, text in zip(page_nos, future.result()):
+            texts[page_no] = text
+    return texts
+
+
+def extract_text_layer(content):
+    """
+    Returns the embedded text of every PDF page as a list (one string per page),
+    or None when pypdf is unavailable or the file can't be parsed.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:  # text-layer fast path is optional, everything falls back to OCR
+        return None
+    try:
+        reader = PdfReader(_open_stream(content))
+        return [page.extract_text() or "" for page in reader.pages]
+    except Exception as e:
+        print(f"Text layer extraction failed, falling back to OCR: {e}")
+        return None
+
+
+def _has_usable_text(text):
+    return sum(1 for ch in text if not ch.isspace()) >= MIN_TEXT_LAYER_CHARS
+
+
+def pdf_to_text(content, client=None):
+    """
+    Returns the text of a PDF, reading the embedded text layer where it exists
+    and only rasterizing + OCR'ing the pages that have no usable text.
+    """
+    page_texts = extract_text_layer(content)
+    if page_texts is None:
+        from pdf2image import pdfinfo_from_bytes
+        page_texts = [""] * pdfinfo_from_bytes(content)["Pages"]
+
+    missing = [i for i, text in enumerate(page_texts, start=1) if not _has_usable_text(text)]
+    print(f"PDF has {len(page_texts)} page(s), {len(page_texts) - len(missing)} with a text layer")
+
+    if missing:
+        for page_no, text in sorted(ocr_pages(iter_pdf_pages(content, missing), client).items()):
+            page_texts[page_no - 1] = text
+            print(f"Page {page_no} OCR text length: {len(text)}")
+
+    return "\n".join(page_texts) + "\n"
@@ -0,0 +1,162 @@
+import hmac
+import math
+import os
+import threading
+import time
+from state_db import get_state_connection
+
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", "60"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+# Expired OTPs are kept this long so verify can still answer "expired" instead of "not found"
+OTP_EXPIRED_GRACE = int(os.getenv("OTP_EXPIRED_GRACE", "300"))
+# "sqlite" is shared by all workers on the host; "memory" only suits a single worker
+OTP_STORE_BACKEND = os.getenv("OTP_STORE_BACKEND", "sqlite")
+
+VERIFIED = "verified"
+NOT_FOUND = "not_found"
+EXPIRED = "expired"
+INVALID = "invalid"
+TOO_MANY_ATTEMPTS = "too_many_attempts"
+
+
+def _check(entry_otp, expires_at, attempts, otp, now):
+    """Returns (status, keep_entry). A kept entry has its attempt counter bumped."""
+    if now > expires_at:
+        return EXPIRED, False
+    if attempts >= OTP_MAX_ATTEMPTS:
+        # stays locked until it expires or a new OTP is sent
+        return TOO_MANY_ATTEMPTS, True
+    if not hmac.compare_digest(entry_otp, otp):
+        return INVALID, True
+    return VERIFIED, False
+
+
+class MemoryOTPStore:
+    """
+    In-process store. Expired entries are evicted by a background thread driving
+    a timing wheel: each tick empties one slot, so eviction costs O(expiring keys)
+    instead of a scan over every stored OTP.
+    """
+
+    def __init__(self, tick=1.0, slots=512):
+        self._entries = {}  # key -> [otp, expires_at, attempts]
+        self._wheel = [set() for _ in range(slots)]
+        self._tick = tick
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="otp-sweeper", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _schedule(self, key, purge_at, now):
+        ticks = min(max(1, math.ceil((purge_at - now) / self._tick)), len(self._wheel) - 1)
+        self._wheel[(self._cursor + ticks) % len(self._wheel)].add(key)
+
+    def _run(self):
+        while not self._stop.wait(self._tick):
+            self.sweep()
+
+    def sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            self._cursor = (self._cursor + 1) % len(self._wheel)
+            due, self._wheel[self._cursor] = self._wheel[self._cursor], set()
+            for key in due:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                purge_at = entry[1] + OTP_EXPIRED_GRACE
+                if purge_at <= now:
+                    del self._entries[key]
+                else:
+                    # re-issued OTP, or a lifetime longer than one turn of the wheel
+                    self._schedule(key, purge_at, now)
+
+    def put(self, key, otp, ttl=OTP_TTL_SECONDS):
+        self.start()
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = [otp, now + ttl, 0]
+            self._schedule(key, now + ttl + OTP_EXPIRED_GRACE, now)
+
+    def verify(self, key, otp):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return NOT_FOUND
+            status, keep = _check(entry[0], entry[1], entry[2], otp, time.monotonic())
+            if keep:
+                entry[2] += 1
+            else:
+                del self._entries[key]
+            return status
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteOTPStore:
+    """Store in the shared state file, so any worker can verify an OTP another worker sent."""
+
+    def __init__(self):
+        get_state_connection().execute("""
+            CREATE TABLE IF NOT EXISTS otp (
+                key TEXT PRIMARY KEY,
+                otp TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        get_state_connection().execute("CREATE INDEX IF NOT EXISTS idx_otp_expires_at ON otp (expires_at)")
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def sweep(self):
+        get_state_connection().execute("DELETE FROM otp WHERE expires_at < ?", (time.time() - OTP_EXPIRED_GRACE,))
+
+    def put(self, key, otp, ttl=OTP_TTL_SECONDS):
+        conn = get_state_connection()
+        conn.execute("INSERT OR REPLACE INTO otp (key, otp, expires_at, attempts) VALUES (?, ?, ?, 0)",
+                     (key, otp, time.time() + ttl))
+        self.sweep()
+
+    def verify(self, key, otp):
+        conn = get_state_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT otp, expires_at, attempts FROM otp WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                status = NOT_FOUND
+            else:
+                status, keep = _check(row[0], row[1], row[2], otp, time.time())
+                if keep:
+                    conn.execute("UPDATE otp SET attempts = attempts + 1 WHERE key = ?", (key,))
+                else:
+                    conn.execute("DELETE FROM otp WHERE key = ?", (key,))
+            conn.execute("COMMIT")
+            return status
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def create_otp_store(backend=OTP_STORE_BACKEND):
+    if backend == "memory":
+        return MemoryOTPStore()
+    if backend == "sqlite":
+        return SQLiteOTPStore()
+    raise ValueError(f"Unknown OTP_STORE_BACKEND: {backend}")
@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Every password hash is written as $2b$<BCRYPT_ROUNDS>$...; older hashes
+# (passlib's cost 10, or any other cost) are upgraded on the next good login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt runs in its own worker processes so a burst of logins can't take the
+# request threadpool (or the GIL) away from every other endpoint.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Workers come from a forkserver, not a fork of the uvicorn worker: by the time
+# the pool starts that process has a gRPC channel and several thread pools,
+# which a forked child can't safely inherit.
+PROCESS_START_METHOD = "forkserver"
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context(PROCESS_START_METHOD)
+        )
+    return _pool
+
+
+def warm_up():
+    """Starts every hashing worker process now rather than on the first login."""
+    pool = get_pool()
+    for future in [pool.submit(_password_bytes, "") for _ in range(PASSWORD_HASH_WORKERS)]:
+        future.result()
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _password_bytes(password):
+    # bcrypt only looks at the first 72 bytes
+    return password.encode('utf-8')[:72]
+
+
+def _hash(password, rounds):
+    import bcrypt  # imported in the hashing worker processes only
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password, stored_hash):
+    import bcrypt
+    try:
+        return bcrypt.checkpw(_password_bytes(password), stored_hash.encode('utf-8'))
+    except ValueError:  # not a bcrypt hash
+        return False
+
+
+def needs_rehash(stored_hash, rounds=None):
+    rounds = rounds or BCRYPT_ROUNDS
+    parts = stored_hash.split("$")  # ['', '2b', '12', '<salt+hash>']
+    try:
+        return parts[1] != "2b" or int(parts[2]) != rounds
+    except (IndexError, ValueError):
+        return True
+
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_pool(), fn, *args)
+
+
+async def hash_password(password):
+    return await _run(_hash, password, BCRYPT_ROUNDS)
+
+
+async def verify_password(password, stored_hash):
+    """
+    Returns (valid, new_hash). new_hash is set when the password was valid but
+    the stored hash uses another cost/format and should be replaced.
+    """
+    valid = await _run(_check, password, stored_hash)
+    if valid and needs_rehash(stored_hash):
+        return True, await hash_password(password)
+    return valid, None
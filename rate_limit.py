@@ -0,0 +1,159 @@
+import math
+import os
+import random
+import threading
+import time
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from state_db import get_state_connection
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# "memory" limits per worker, "sqlite" shares the buckets between workers on the host
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Every client gets a bucket of RATE_LIMIT_CAPACITY tokens refilled at RATE_LIMIT_REFILL tokens/second
+RATE_LIMIT_CAPACITY = float(os.getenv("RATE_LIMIT_CAPACITY", "100"))
+RATE_LIMIT_REFILL = float(os.getenv("RATE_LIMIT_REFILL", "5"))
+# share of sqlite takes that also delete buckets which have refilled completely
+RATE_LIMIT_PURGE_RATE = 0.01
+
+# Token cost of a request, roughly proportional to the work it triggers.
+# Anything not listed costs DEFAULT_COST.
+ENDPOINT_COSTS = {
+    "/api_scan/upload": 20,
+    "/api_submission/submit_graded": 20,
+    "/api_submission/regrade": 20,
+    "/api_exam/exams_file_preview": 20,
+    "/login": 5,
+    "/register": 5,
+    "/api_password/reset_password": 5,
+    "/api_password/send_otp": 10,
+    "/api_password/send_otp_email": 10,
+}
+DEFAULT_COST = 1
+
+
+class MemoryBucketStore:
+    blocking = False
+
+    def __init__(self, capacity=RATE_LIMIT_CAPACITY, refill=RATE_LIMIT_REFILL, max_keys=50000):
+        self.capacity = capacity
+        self.refill = refill
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def take(self, key, cost):
+        """Returns 0 if the request may go ahead, otherwise the seconds until it could."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self._buckets[key] = [self.capacity, now]
+            tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return 0
+            bucket[0] = tokens
+            return (cost - tokens) / self.refill
+
+    def _prune(self, now):
+        # a bucket that has refilled completely is the same as no bucket
+        full = [k for k, (tokens, updated_at) in self._buckets.items()
+                if tokens + (now - updated_at) * self.refill >= self.capacity]
+        for key in full:
+            del self._buckets[key]
+
+
+class SQLiteBucketStore:
+    # take() may wait up to the state file's busy timeout, so it runs off the event loop
+    blocking = True
+
+    def __init__(self, capacity=RATE_LIMIT_CAPACITY, refill=RATE_LIMIT_REFILL, purge_rate=RATE_LIMIT_PURGE_RATE):
+        self.capacity = capacity
+        self.refill = refill
+        self.purge_rate = purge_rate
+        conn = get_state_connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_bucket (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS rate_bucket_updated_at ON rate_bucket (updated_at)")
+
+    def purge(self, now=None):
+        """Deletes buckets untouched long enough to have refilled; a missing bucket starts full anyway."""
+        now = time.time() if now is None else now
+        get_state_connection().execute("DELETE FROM rate_bucket WHERE updated_at < ?",
+                                       (now - self.capacity / self.refill,))
+
+    def take(self, key, cost):
+        conn = get_state_connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM rate_bucket WHERE key = ?", (key,)).fetchone()
+            tokens = self.capacity if row is None else min(self.capacity, row[0] + (now - row[1]) * self.refill)
+            wait = 0 if tokens >= cost else (cost - tokens) / self.refill
+            if not wait:
+                tokens -= cost
+            conn.execute("INSERT OR REPLACE INTO rate_bucket (key, tokens, updated_at) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if random.random() < self.purge_rate:
+            self.purge(now)
+        return wait
+
+
+def create_bucket_store(backend=RATE_LIMIT_BACKEND):
+    if backend == "memory":
+        return MemoryBucketStore()
+    if backend == "sqlite":
+        return SQLiteBucketStore()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+
+
+def client_key(request):
+    """
+    The client IP. Lecturer ids in the query or headers aren't authenticated,
+    so keying on them would let a client dodge its limit by rotating the id or
+    drain someone else's bucket. Behind a proxy, run uvicorn with
+    --proxy-headers so this is the real client address.
+    """
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """Token-bucket admission control; answers 429 with Retry-After when a client's bucket is empty."""
+
+    def __init__(self, app, store=None, costs=None):
+        super().__init__(app)
+        self.store = store or create_bucket_store()
+        self.costs = ENDPOINT_COSTS if costs is None else costs
+
+    async def dispatch(self, request, call_next):
+        if not RATE_LIMIT_ENABLED:
+            return await call_next(request)
+
+        cost = min(self.costs.get(request.url.path, DEFAULT_COST), self.store.capacity)
+        if cost > 0:
+            key = client_key(request)
+            if getattr(self.store, "blocking", False):
+                wait = await run_in_threadpool(self.store.take, key, cost)
+            else:
+                wait = self.store.take(key, cost)
+            if wait:
+                return JSONResponse(
+                    status_code=429,
+                    content={"detail": "Too many requests, please retry later"},
+                    headers={"Retry-After": str(math.ceil(wait))}
+                )
+        return await call_next(request)
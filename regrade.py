@@ -0,0 +1,138 @@
+# Regrades every result of an exam from the OCR text stored with its submission,
+# e.g. after a scheme was edited. Matching runs in worker processes; results are
+# written back in batches, one transaction each.
+#   python regrade.py E001 [--workers 4] [--batch-size 200]
+# Also exposed as POST /api_submission/regrade.
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from database import get_connection
+from grading import grade_text, load_exam_schemes, outcome_rows, save_outcomes, summarize
+from response_cache import invalidate
+
+REGRADE_WORKERS = int(os.getenv("REGRADE_WORKERS", str(os.cpu_count() or 2)))
+REGRADE_BATCH_SIZE = int(os.getenv("REGRADE_BATCH_SIZE", "200"))
+
+
+def _grade_chunk(chunk):
+    """Runs in a worker process: [(result_id, text, schemes)] -> [(result_id, grading)]."""
+    return [(result_id, grade_text(text, schemes, verbose=False)) for result_id, text, schemes in chunk]
+
+
+def load_scripts(cursor, exam_id):
+    """
+    (result_id, ocr_text, schemes) for each result of the exam that has stored
+    text. A result is regraded against the schemes it was graded on, at their
+    current text and marks; results without stored outcomes get every scheme.
+    """
+    exam_schemes = load_exam_schemes(cursor, exam_id)
+    by_id = {scheme["scheme_id"]: scheme for scheme in exam_schemes}
+
+    cursor.execute("""
+        SELECT rs.Result_ID AS result_id, rs.Scheme_ID AS scheme_id
+        FROM result_scheme rs
+        JOIN result r ON r.Result_ID = rs.Result_ID
+        JOIN answer_submission a ON a.Submission_ID = r.Submission_ID
+        WHERE a.Exam_ID = %s
+        ORDER BY rs.Outcome_ID
+    """, (exam_id,))
+    graded_on = {}
+    for row in cursor.fetchall():
+        if row["scheme_id"] in by_id:
+            graded_on.setdefault(row["result_id"], []).append(by_id[row["scheme_id"]])
+
+    # the server's OCR of the image first: submissions from older clients have
+    # no OCR_Text, and text a client sent back may not match the script
+    cursor.execute("""
+        SELECT r.Result_ID AS result_id, COALESCE(oc.OCR_Text, a.OCR_Text) AS ocr_text
+        FROM answer_submission a
+        JOIN result r ON r.Submission_ID = a.Submission_ID
+        LEFT JOIN ocr_cache oc ON oc.Content_Hash = a.Content_Hash
+        WHERE a.Exam_ID = %s
+    """, (exam_id,))
+    scripts, skipped = [], 0
+    for row in cursor.fetchall():
+        if row["ocr_text"] is None:
+            skipped += 1
+            continue
+        scripts.append((row["result_id"], row["ocr_text"], graded_on.get(row["result_id"], exam_schemes)))
+    return scripts, skipped
+
+
+def _write_batch(conn, cursor, graded):
+    result_ids = [result_id for result_id, _ in graded]
+    cursor.executemany("""
+        UPDATE result
+        SET Score = %s, Summary = %s, Awarded_Marks = %s, Possible_Marks = %s
+        WHERE Result_ID = %s
+    """, [
+        (str(g["total_awarded_marks"]), summarize(g), g["total_awarded_marks"], g["total_possible_marks"], result_id)
+        for result_id, g in graded
+    ])
+    placeholders = ", ".join(["%s"] * len(result_ids))
+    cursor.execute(f"DELETE FROM result_scheme WHERE Result_ID IN ({placeholders})", result_ids)
+    save_outcomes(cursor, [row for result_id, g in graded for row in outcome_rows(result_id, g["results"])])
+    conn.commit()
+
+
+def regrade_exam(exam_id, workers=REGRADE_WORKERS, batch_size=REGRADE_BATCH_SIZE):
+    start = time.perf_counter()
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        scripts, skipped = load_scripts(cursor, exam_id)
+        conn.commit()  # end the read snapshot before the write transactions
+        chunks = [scripts[i:i + batch_size] for i in range(0, len(scripts), batch_size)]
+
+        regraded = 0
+        if chunks:
+            # forkserver rather than fork: the API worker calling this has a gRPC
+            # channel and thread pools that a forked child can't inherit safely
+            with ProcessPoolExecutor(
+                max_workers=max(1, min(workers, len(chunks))),
+                mp_context=multiprocessing.get_context("forkserver")
+            ) as pool:
+                for graded in pool.map(_grade_chunk, chunks):
+                    try:
+                        _write_batch(conn, cursor, graded)
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    regraded += len(graded)
+    finally:
+        cursor.close()
+        conn.close()
+        # analytics keyed on results have to recompute even after a partial run
+        invalidate("results")
+
+    return {
+        "exam_id": exam_id,
+        "regraded": regraded,
+        "skipped_without_text": skipped,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regrade an exam's results from stored OCR text")
+    parser.add_argument("exam_id")
+    parser.add_argument("--workers", type=int, default=REGRADE_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=REGRADE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    try:
+        summary = regrade_exam(args.exam_id, args.workers, args.batch_size)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    print(f"Regraded {summary['regraded']} result(s) of {summary['exam_id']} in {summary['elapsed_s']} s, "
+          f"{summary['skipped_without_text']} skipped without stored OCR text")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from fastapi.responses import Response
+from serialization import dumps
+from state_db import get_state_connection
+
+# "sqlite" shares the version counters between workers on the host, so a write
+# handled by one worker invalidates what the others cached; "memory" only suits a single worker
+CACHE_VERSION_BACKEND = os.getenv("CACHE_VERSION_BACKEND", "sqlite")
+RESPONSE_CACHE_ENTRIES = int(os.getenv("RESPONSE_CACHE_ENTRIES", "2000"))
+
+# Resources whose list responses are cached, and which versions a write to each
+# one has to bump. Exam lists carry question counts and question lists carry
+# scheme counts, and deleting a parent row cascades to its children.
+INVALIDATES = {
+    "classes": ("classes", "students", "exams", "questions", "schemes"),
+    "students": ("students",),
+    "exams": ("exams", "questions", "schemes"),
+    "questions": ("questions", "exams", "schemes"),
+    "schemes": ("schemes", "questions"),
+    # not served from this cache; versioned so analytics built on results can
+    # tell when existing ones were rewritten (regrades)
+    "results": ("results",),
+}
+
+
+class MemoryVersionStore:
+    def __init__(self):
+        # start from the boot time so ETags handed out before a restart don't match
+        self._start = int(time.time() * 1000)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, resource):
+        with self._lock:
+            return self._versions.get(resource, self._start)
+
+    def bump(self, resources):
+        with self._lock:
+            for resource in resources:
+                self._versions[resource] = self._versions.get(resource, self._start) + 1
+
+
+class SQLiteVersionStore:
+    def __init__(self, resources=tuple(INVALIDATES)):
+        # Counters start from the time they were first created rather than 0,
+        # so when the state file is wiped (reboot, new STATE_DB_PATH) the new
+        # ones don't repeat versions behind ETags clients already hold.
+        self._start = int(time.time() * 1000)
+        conn = get_state_connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_version (
+                resource TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        """)
+        conn.executemany("INSERT OR IGNORE INTO cache_version (resource, version) VALUES (?, ?)",
+                         [(resource, self._start) for resource in resources])
+
+    def get(self, resource):
+        row = get_state_connection().execute(
+            "SELECT version FROM cache_version WHERE resource = ?", (resource,)
+        ).fetchone()
+        return row[0] if row else self._start
+
+    def bump(self, resources):
+        conn = get_state_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for resource in resources:
+                conn.execute("""
+                    INSERT INTO cache_version (resource, version) VALUES (?, ?)
+                    ON CONFLICT(resource) DO UPDATE SET version = version + 1
+                """, (resource, self._start + 1))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def create_version_store(backend=CACHE_VERSION_BACKEND):
+    if backend == "memory":
+        return MemoryVersionStore()
+    if backend == "sqlite":
+        return SQLiteVersionStore()
+    raise ValueError(f"Unknown CACHE_VERSION_BACKEND: {backend}")
+
+
+class ResponseCache:
+    """Serialized response bodies of this worker, keyed by request and tagged with their ETag (LRU)."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (etag, body)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def put(self, key, etag, body):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits,
+                    "misses": self.misses, "not_modified": self.not_modified}
+
+
+versions = create_version_store()
+cache = ResponseCache()
+
+
+def invalidate(resource):
+    """Call after committing a write to `resource`."""
+    versions.bump(INVALIDATES[resource])
+
+
+def _etag(resource, version, key):
+    digest = hashlib.sha1(f"{resource}:{version}:{key}".encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def cached_json(request, resource, build):
+    """
+    Serves the JSON body `build()` returns, cached until `resource` changes.
+    A client sending back a current ETag in If-None-Match gets 304 without
+    build() running or anything being serialized.
+    """
+    # read the version before building so a write racing with build() can only
+    # leave the entry stale under an already superseded ETag
+    version = versions.get(resource)
+    key = f"{request.url.path}?{sorted(request.query_params.multi_items())}"
+    etag = _etag(resource, version, key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if _matches(request.headers.get("if-none-match"), etag):
+        cache.count_not_modified()
+        return Response(status_code=304, headers=headers)
+
+    body = cache.get(key, etag)
+    if body is None:
+        body = dumps(build())
+        cache.put(key, etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -2,42 +2,63 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from database import get_connection
-import bcrypt
+from executors import bulkhead_route, run_in_pool
+from identity import find_lecturer
+from passwords import verify_password
 
-router = APIRouter()
+router = APIRouter(route_class=bulkhead_route("auth"))
 
 class LoginRequest(BaseModel):
     emailOrId: str
     password: str
 
-@router.post("/login")
-def login(login: LoginRequest):
+def find_login_user(email_or_phone):
     conn = get_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Database connection failed")
 
     cursor = conn.cursor(dictionary=True)
-    sql = """
-        SELECT lecturer_id, email, phone_number, password FROM lecturer 
-        WHERE email = %s OR phone_number = %s LIMIT 1
-    """
-    cursor.execute(sql, (login.emailOrId, login.emailOrId))
-    user = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    try:
+        return find_lecturer(cursor, email=email_or_phone, phone=email_or_phone,
+                             columns=("lecturer_id", "password"))
+    finally:
+        cursor.close()
+        conn.close()
+
+def update_password_hash(lecturer_id, old_hash, new_hash):
+    conn = get_connection()
+    if not conn:
+        return
+    cursor = conn.cursor()
+    try:
+        # Only replace the hash we verified against, in case the password changed meanwhile
+        cursor.execute(
+            "UPDATE lecturer SET password = %s WHERE lecturer_id = %s AND password = %s",
+            (new_hash, lecturer_id, old_hash)
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+@router.post("/login")
+async def login(login: LoginRequest):
+    user = await run_in_pool("auth", find_login_user, login.emailOrId)
 
     if not user:
         return {"success": False, "message": "Invalid email or phone number or password"}
 
-    # Truncate password to 72 bytes and verify with bcrypt
-    password_bytes = login.password.encode('utf-8')[:72]
-    stored_hash = user["password"].encode('utf-8')
-    
-    if bcrypt.checkpw(password_bytes, stored_hash):
+    # bcrypt runs on the dedicated password-hashing pool, not the request threadpool
+    valid, new_hash = await verify_password(login.password, user["password"])
+
+    if valid:
+        if new_hash:
+            print(f"Upgrading password hash for {user['lecturer_id']}")
+            await run_in_pool("auth", update_password_hash, user["lecturer_id"], user["password"], new_hash)
         return {
             "success": True,
             "message": "Login successful",
             "lecturer_id": user["lecturer_id"]
         }
     else:
-        return {"success": False, "message": "Invalid email or phone number or password"}
\ No newline at end of file
+        return {"success": False, "message": "Invalid email or phone number or password"}
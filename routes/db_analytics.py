@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, Query
 from database import get_connection
+from executors import bulkhead_route
+from difficulty import difficulty_cache
 
-router = APIRouter(prefix="/api_analytics", tags=["Analytics"])
+router = APIRouter(prefix="/api_analytics", tags=["Analytics"], route_class=bulkhead_route("analytics"))
 
 @router.get("/completion")
 def get_completion_stats(class_id: str = Query(...), exam_id: str = Query(...)):
@@ -68,37 +70,40 @@ def get_completion_stats(class_id: str = Query(...), exam_id: str = Query(...)):
 @router.get("/score_distribution")
 def get_score_distribution(class_id: str = Query(...), exam_id: str = Query(...)):
     conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
     cur = conn.cursor(dictionary=True)
 
-    # total marks
-    cur.execute("SELECT SUM(Total_Marks) AS total_marks FROM question WHERE Exam_ID=%s", (exam_id,))
-    total_marks = cur.fetchone()["total_marks"] or 0
-    print(f"[DEBUG] Total Marks: {total_marks}")
-
-    # number of students who took it
-    cur.execute("""
-        SELECT COUNT(DISTINCT a.Student_ID) AS taken
-        FROM answer_submission a
-        JOIN student s USING(Student_ID)
-        WHERE a.Exam_ID=%s AND s.Class_ID=%s
-    """, (exam_id, class_id))
-    students_taken = cur.fetchone()["taken"] or 0
-    print(f"[DEBUG] Students Taken: {students_taken}")
-
-    # distribution of scores
-    cur.execute("""
-        SELECT r.Score AS score, COUNT(*) AS count FROM result r
-        JOIN answer_submission a USING(Submission_ID)
-        JOIN student s USING(Student_ID)
-        WHERE a.Exam_ID=%s AND s.Class_ID=%s
-        GROUP BY r.Score
-        ORDER BY r.Score DESC
-    """, (exam_id, class_id))
-    dist = cur.fetchall()
-    print(f"[DEBUG] Score Distribution: {dist}")
-
-    cur.close()
-    conn.close()
+    try:
+        # total marks
+        cur.execute("SELECT SUM(Total_Marks) AS total_marks FROM question WHERE Exam_ID=%s", (exam_id,))
+        total_marks = cur.fetchone()["total_marks"] or 0
+        print(f"[DEBUG] Total Marks: {total_marks}")
+
+        # number of students who took it
+        cur.execute("""
+            SELECT COUNT(DISTINCT a.Student_ID) AS taken
+            FROM answer_submission a
+            JOIN student s USING(Student_ID)
+            WHERE a.Exam_ID=%s AND s.Class_ID=%s
+        """, (exam_id, class_id))
+        students_taken = cur.fetchone()["taken"] or 0
+        print(f"[DEBUG] Students Taken: {students_taken}")
+
+        # distribution of scores
+        cur.execute("""
+            SELECT r.Score AS score, COUNT(*) AS count FROM result r
+            JOIN answer_submission a USING(Submission_ID)
+            JOIN student s USING(Student_ID)
+            WHERE a.Exam_ID=%s AND s.Class_ID=%s
+            GROUP BY r.Score
+            ORDER BY r.Score DESC
+        """, (exam_id, class_id))
+        dist = cur.fetchall()
+        print(f"[DEBUG] Score Distribution: {dist}")
+    finally:
+        cur.close()
+        conn.close()
 
     return {
         "success": True,
@@ -112,6 +117,8 @@ def get_score_distribution(class_id: str = Query(...), exam_id: str = Query(...)
 @router.get("/exam_summary")
 def get_exam_summary(class_id: str, exam_id: str):
     conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
     cursor = conn.cursor(dictionary=True)
 
     try:
@@ -149,3 +156,28 @@ def get_exam_summary(class_id: str, exam_id: str):
         cursor.close()
         conn.close()
 
+
+@router.get("/difficulty")
+def get_difficulty(class_id: str = Query(...), exam_id: str = Query(...)):
+    """
+    Average marks per question and hit rate per scheme (share of scripts that
+    got the point), from the stored per-scheme outcomes. Within a question the
+    schemes students miss most come first.
+    """
+    conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    cursor = conn.cursor(dictionary=True)
+    try:
+        questions = difficulty_cache.report(cursor, class_id, exam_id)
+        most_missed = sorted(
+            (dict(scheme, question_id=q["question_id"]) for q in questions for scheme in q["schemes"]),
+            key=lambda s: (s["hit_rate"], s["scheme_id"])
+        )[:5]
+        return {
+            "success": True,
+            "data": {"questions": questions, "most_missed": most_missed}
+        }
+    finally:
+        cursor.close()
+        conn.close()
@@ -1,15 +1,22 @@
-from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi import APIRouter, HTTPException, Path, Query, Request
 from pydantic import BaseModel
 from database import get_connection
+from executors import bulkhead_route
+from response_cache import cached_json, invalidate
 
 router = APIRouter(
     prefix="/api_class",
-    tags=["Classes"]  # optional, useful if you use FastAPI docs UI
+    tags=["Classes"],  # optional, useful if you use FastAPI docs UI
+    route_class=bulkhead_route("crud")
 )
 
 # fetch class by lecturer id
 @router.get("/classes")
-def get_classes_by_lecturer(lecturer_id: str = Query(..., max_length=10)):
+def get_classes_by_lecturer(request: Request, lecturer_id: str = Query(..., max_length=10)):
+    return cached_json(request, "classes", lambda: fetch_classes(lecturer_id))
+
+
+def fetch_classes(lecturer_id):
     conn = get_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -25,13 +32,12 @@ def get_classes_by_lecturer(lecturer_id: str = Query(..., max_length=10)):
             (lecturer_id,)
         )
         classes = cursor.fetchall()
-        cursor.close()
-        conn.close()
         return {"success": True, "data": classes}
     except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
         cursor.close()
         conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
 
 
 class ClassCreateRequest(BaseModel):
@@ -80,8 +86,7 @@ def add_class(request: ClassCreateRequest):
         )
 
         conn.commit()
-        cursor.close()
-        conn.close()
+        invalidate("classes")
 
         return {
             "success": True,
@@ -90,9 +95,10 @@ def add_class(request: ClassCreateRequest):
         }
 
     except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
         cursor.close()
         conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
     
 class ClassUpdateRequest(BaseModel):
     class_name: str
@@ -124,15 +130,15 @@ def update_class(class_id: str = Path(..., max_length=10), request: ClassUpdateR
         conn.commit()
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Class not found")
-        cursor.close()
-        conn.close()
+        invalidate("classes")
 
         return {"success": True, "message": "Class updated successfully"}
 
     except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
         cursor.close()
         conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.delete("/classes/{class_id}")
@@ -150,12 +156,12 @@ def delete_class(class_id: str = Path(..., max_length=10)):
         conn.commit()
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Class not found")
-        cursor.close()
-        conn.close()
+        invalidate("classes")
 
         return {"success": True, "message": "Class deleted successfully"}
 
     except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
         cursor.close()
-        conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        conn.close()
\ No newline at end of file
@@ -1,24 +1,34 @@
-from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Query, Request, UploadFile, File, Form
 from pydantic import BaseModel
 from typing import Optional
+from datetime import datetime
 from database import get_connection
+from executors import bulkhead_route, run_in_pool
 from typing import List, Dict
-from google.cloud import vision
 import io
 import os
-from fuzzywuzzy import fuzz
 import json
 import re
-from pdf2image import convert_from_bytes
+from ocr import ocr_image, pdf_to_text
+from exam_parser import parse_exam_markup
+from uploads import read_upload
+from response_cache import cached_json, invalidate
 
-router = APIRouter(prefix="/api_exam", tags=["Exams"])
+# Lecturer_ID and Created_At are copied onto each exam for the activity feed
+LECTURER_OF_CLASS = "(SELECT c.Lecturer_ID FROM class c WHERE c.Class_ID = %s)"
+
+router = APIRouter(prefix="/api_exam", tags=["Exams"], route_class=bulkhead_route("crud"))
 
 @router.get("/test")
 def test_exam_route():
     return {"message": "Exam router works"}
 
 @router.get("/exams")
-def get_exams_by_class(class_id: str = Query(...)):
+def get_exams_by_class(request: Request, class_id: str = Query(...)):
+    return cached_json(request, "exams", lambda: fetch_exams(class_id))
+
+
+def fetch_exams(class_id):
     conn = get_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -58,11 +68,12 @@ def add_exam(exam: ExamCreate):
         last = cursor.fetchone()
         next_id = f"E{(int(last['Exam_ID'][1:]) + 1) if last else 1:03d}"
 
-        cursor.execute("""
-            INSERT INTO exam (Exam_ID, Class_ID, Exam_Name)
-            VALUES (%s, %s, %s)
-        """, (next_id, exam.class_id, exam.name))
+        cursor.execute(f"""
+            INSERT INTO exam (Exam_ID, Class_ID, Exam_Name, Lecturer_ID, Created_At)
+            VALUES (%s, %s, %s, {LECTURER_OF_CLASS}, %s)
+        """, (next_id, exam.class_id, exam.name, exam.class_id, datetime.now()))
         conn.commit()
+        invalidate("exams")
         return {"success": True, "message": "Exam added", "exam_id": next_id}
     finally:
         cursor.close()
@@ -82,6 +93,7 @@ def update_exam(exam_id: str, exam: ExamUpdate):
         conn.commit()
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Exam not found")
+        invalidate("exams")
         return {"success": True, "message": "Exam updated"}
     finally:
         cursor.close()
@@ -98,6 +110,7 @@ def delete_exam(exam_id: str):
         conn.commit()
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Exam not found")
+        invalidate("exams")
         return {"success": True, "message": "Exam deleted"}
     finally:
         cursor.close()
@@ -106,29 +119,16 @@ def delete_exam(exam_id: str):
 @router.post("/exams_file_preview")
 async def preview_exam_file(file: UploadFile = File(...)):
     try:
-        content = await file.read()
-        print(f"Received file: {file.filename}, size={len(content)} bytes")
-
-        client = vision.ImageAnnotatorClient()
-        extracted_text = ""
-
-        # ---------- OCR ----------
-        if file.filename.lower().endswith(".pdf"):
-            print("PDF detected, converting to images...")
-            images = convert_from_bytes(content)
-            for i, img in enumerate(images, start=1):
-                img_byte_arr = io.BytesIO()
-                img.save(img_byte_arr, format='PNG')
-                image = vision.Image(content=img_byte_arr.getvalue())
-                response = client.document_text_detection(image=image)
-                page_text = response.full_text_annotation.text if response.full_text_annotation else ""
-                print(f"Page {i} OCR text length: {len(page_text)}")
-                extracted_text += page_text + "\n"
-        else:
-            print("Image detected, sending directly to Vision API...")
-            image = vision.Image(content=content)
-            response = client.document_text_detection(image=image)
-            extracted_text = response.full_text_annotation.text if response.full_text_annotation else ""
+        with await read_upload(file) as upload:
+            print(f"Received file: {file.filename}, size={upload.size} bytes")
+
+            # ---------- OCR ----------
+            if file.filename.lower().endswith(".pdf"):
+                print("PDF detected, reading text layer...")
+                extracted_text = await run_in_pool("ocr", pdf_to_text, upload.view())
+            else:
+                print("Image detected, sending directly to Vision API...")
+                extracted_text = await run_in_pool("ocr", ocr_image, upload.view())
 
         # ---------- Cleanup ----------
         lines = [l.strip() for l in extracted_text.split("\n") if l.strip()]
@@ -137,62 +137,16 @@ async def preview_exam_file(file: UploadFile = File(...)):
         print(cleaned_text)
         print("----------------------------")
 
-        # ---------- Regex to parse questions & schemes ----------
-        question_pattern = re.compile(
-            r'<Question\s*(\d+)\s*marks\s*=\s*"?(.*?)"?>(.*?)</Question\s*\1>',
-            re.DOTALL | re.IGNORECASE
-        )
-        scheme_pattern = re.compile(
-            r'<Scheme\s*(\d+)\s*marks\s*=\s*"?(.*?)"?>(.*?)</Scheme\s*\1>',
-            re.DOTALL | re.IGNORECASE
-        )
-
-        questions_matches = question_pattern.findall(cleaned_text)
-        print(f"Found {len(questions_matches)} question(s)")
+        # ---------- Parse questions & schemes ----------
+        questions = parse_exam_markup(cleaned_text)
+        print(f"Found {len(questions)} question(s)")
 
         parsed = []
-        for idx, (q_no, q_marks, q_text) in enumerate(questions_matches, start=1):
-            q_text_clean = q_text.strip()
-            print(f"\nQuestion {q_no}: {q_text_clean[:50]}... Marks: {q_marks}")
-
-            # Get question block
-            q_start_regex = re.compile(
-                rf'<Question\s*{q_no}\s*marks\s*=\s*"?{q_marks}"?>',
-                re.IGNORECASE
-            )
-            q_start_match = q_start_regex.search(cleaned_text)
-            q_start = q_start_match.start() if q_start_match else 0
-
-            if idx < len(questions_matches):
-                next_q_no, next_q_marks, _ = questions_matches[idx]
-                q_end_regex = re.compile(
-                    rf'<Question\s*{next_q_no}\s*marks\s*=\s*"?{next_q_marks}"?>',
-                    re.IGNORECASE
-                )
-                q_end_match = q_end_regex.search(cleaned_text)
-                q_end = q_end_match.start() if q_end_match else len(cleaned_text)
-            else:
-                q_end = len(cleaned_text)
-
-            q_block = cleaned_text[q_start:q_end]
-
-            # Extract schemes
-            schemes_for_q = []
-            for s_no, s_marks, s_text in scheme_pattern.findall(q_block):
-                scheme_text_clean = s_text.strip()
-                print(f"  Found scheme {s_no}: {scheme_text_clean[:50]}... Marks: {s_marks}")
-                schemes_for_q.append({
-                    "scheme_no": int(s_no),
-                    "scheme_text": scheme_text_clean,
-                    "marks": int(s_marks)
-                })
-
-            parsed.append({
-                "question_no": int(q_no),
-                "question_text": q_text_clean,
-                "marks": int(q_marks),
-                "schemes": schemes_for_q
-            })
+        for q in questions:
+            print(f"\nQuestion {q.question_no}: {q.question_text[:50]}... Marks: {q.marks}")
+            for scheme in q.schemes:
+                print(f"  Found scheme {scheme.scheme_no}: {scheme.scheme_text[:50]}... Marks: {scheme.marks}")
+            parsed.append(q.to_dict())
 
         print("\n----- Parsed Structure -----")
         print(parsed)
@@ -200,6 +154,8 @@ async def preview_exam_file(file: UploadFile = File(...)):
 
         return {"success": True, "raw_text": cleaned_text, "parsed": parsed}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"ERROR: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -223,8 +179,9 @@ async def create_exam_with_file(
         next_exam_id = f"E{(int(last['Exam_ID'][1:]) + 1) if last else 1:03d}"
 
         cursor.execute(
-            "INSERT INTO exam (Exam_ID, Class_ID, Exam_Name) VALUES (%s, %s, %s)",
-            (next_exam_id, class_id, name)
+            f"INSERT INTO exam (Exam_ID, Class_ID, Exam_Name, Lecturer_ID, Created_At) "
+            f"VALUES (%s, %s, %s, {LECTURER_OF_CLASS}, %s)",
+            (next_exam_id, class_id, name, class_id, datetime.now())
         )
 
         # ---------- 2. Insert Questions & Schemes ----------
@@ -252,6 +209,7 @@ async def create_exam_with_file(
                 )
 
         conn.commit()
+        invalidate("exams")
         return {"success": True, "exam_id": next_exam_id}
 
     except Exception as e:
@@ -1,7 +1,10 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Query
 from database import get_connection
+from executors import bulkhead_route
+from activity import decode_cursor, feed
 
-router = APIRouter(prefix="/api_homepage", tags=["Homepage"])
+router = APIRouter(prefix="/api_homepage", tags=["Homepage"], route_class=bulkhead_route("analytics"))
 
 @router.get("/summary")
 def get_homepage_summary(lecturer_id: str = Query(...)):
@@ -63,3 +66,31 @@ def get_homepage_summary(lecturer_id: str = Query(...)):
     finally:
         cursor.close()
         conn.close()
+
+
+@router.get("/activity")
+def get_activity(
+    lecturer_id: str = Query(...),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None)
+):
+    """
+    Recent exams and submissions of the lecturer, newest first. Pass the
+    returned next_cursor back as `cursor` for the next page.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+
+    db_cursor = conn.cursor(dictionary=True)
+    try:
+        events, next_cursor = feed(db_cursor, lecturer_id, limit, after)
+        return {"success": True, "data": events, "next_cursor": next_cursor}
+    finally:
+        db_cursor.close()
+        conn.close()
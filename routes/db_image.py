@@ -0,0 +1,92 @@
+import os
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+import blob_store
+from executors import bulkhead_route, run_in_pool
+
+router = APIRouter(prefix="/api_image", tags=["Images"], route_class=bulkhead_route("crud"))
+
+# Stored files never change, so clients and proxies may keep them for good.
+CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable", "Accept-Ranges": "bytes"}
+CHUNK_BYTES = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single "bytes=" range. None when there is no
+    range or it is malformed or unsupported (RFC 7233: ignore it, send the
+    whole file); ValueError for a well-formed range the file can't satisfy.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    if not first:  # suffix range: the last N bytes
+        if not last.isdigit():
+            return None
+        if int(last) == 0 or size == 0:
+            raise ValueError(header)
+        return max(0, size - int(last)), size - 1
+    if not first.isdigit() or (last and not last.isdigit()):
+        return None
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def _read_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(request, path, etag, media_type):
+    """Whole file through FileResponse (sendfile where the server supports it), or a 206 for a Range request."""
+    headers = {**CACHE_HEADERS, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    size = os.path.getsize(path)
+    try:
+        byte_range = parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if request.headers.get("if-range") not in (None, etag):
+        byte_range = None  # changed since the client's partial copy: send it all
+
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    start, end = byte_range
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(_read_range(path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+
+@router.get("/{content_hash}")
+def download_image(request: Request, content_hash: str):
+    if not blob_store.exists(content_hash):
+        raise HTTPException(status_code=404, detail="Image not found")
+    path = blob_store.blob_path(content_hash)
+    return file_response(request, path, f'"{content_hash}"', blob_store.media_type(path))
+
+
+@router.get("/{content_hash}/thumbnail")
+async def download_thumbnail(request: Request, content_hash: str, size: int = Query(256)):
+    if size not in blob_store.THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {list(blob_store.THUMBNAIL_SIZES)}")
+    if not blob_store.exists(content_hash):
+        raise HTTPException(status_code=404, detail="Image not found")
+    try:
+        # rendering is image work, so it goes to the OCR pool like preprocessing does
+        path = await run_in_pool("ocr", blob_store.thumbnail_path, content_hash, size)
+    except OSError:
+        raise HTTPException(status_code=415, detail="Stored file is not an image")
+    return file_response(request, path, f'"{content_hash}-{size}"', "image/jpeg")
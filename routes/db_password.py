@@ -1,26 +1,21 @@
 from fastapi import APIRouter, HTTPException
 from database import get_connection
+from executors import bulkhead_route, run_in_pool
 import random
-import requests
+import queue
 from fastapi import Request
-from secretkey import ULTRAMSG_INSTANCE_ID, ULTRAMSG_TOKEN, EMAIL_SENDER, EMAIL_APP_PASSWORD
 import time
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
-from passlib.context import CryptContext
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from passwords import hash_password
+from identity import find_lecturer
+import otp_store as otp_backends
+from notifications import get_dispatcher
 
 
-router = APIRouter(prefix="/api_password", tags=["Authentication"])
+router = APIRouter(prefix="/api_password", tags=["Authentication"], route_class=bulkhead_route("notifications"))
 
-otp_store = {}  # phone -> otp
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__rounds=10  # default is 12, lowering to 10 makes it ~2x faster
-)
+otp_store = otp_backends.create_otp_store()  # phone/email -> otp, shared across workers
 
 @router.get("/check_user")
 def check_user(email: str = None, phone: str = None):
@@ -34,11 +29,10 @@ def check_user(email: str = None, phone: str = None):
     cursor = conn.cursor(dictionary=True)
     try:
         if email:
-            cursor.execute("SELECT * FROM lecturer WHERE Email = %s", (email,))
-        elif phone:
-            cursor.execute("SELECT * FROM lecturer WHERE Phone_Number = %s", (phone,))
-        
-        user = cursor.fetchone()
+            user = find_lecturer(cursor, email=email, columns=("Lecturer_ID",))
+        else:
+            user = find_lecturer(cursor, phone=phone, columns=("Lecturer_ID",))
+
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -56,27 +50,16 @@ def send_otp(request: Request, phone: str):
     formatted_phone = f"+60{phone.lstrip('0')}"
     message = f"Your Grading Bot verification code is: {otp}"
 
-    # Send OTP to WhatsApp
-    url = f"https://api.ultramsg.com/{ULTRAMSG_INSTANCE_ID}/messages/chat"
-    payload = {
-        "token": ULTRAMSG_TOKEN,
-        "to": formatted_phone,
-        "body": message,
-    }
+    # Store with expiration time (OTP_TTL_SECONDS, 60 by default)
+    otp_store.put(phone, otp)
 
+    # Delivered to WhatsApp in the background, with retries
     try:
-        response = requests.post(url, data=payload)
-        response.raise_for_status()
-
-        # Store with expiration time (60 seconds)
-        otp_store[phone] = {
-            "otp": otp,
-            "expires_at": time.time() + 60
-        }
+        get_dispatcher().send_whatsapp(formatted_phone, message)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Failed to send WhatsApp message: too many pending messages")
 
-        return {"success": True}
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Failed to send WhatsApp message: {e}")
+    return {"success": True}
     
 class EmailRequest(BaseModel):
     email: str
@@ -90,28 +73,15 @@ def send_otp_email(payload: EmailRequest):
     otp = str(random.randint(1000, 9999))
     message = f"Your Grading Bot verification code is: {otp}"
 
+    otp_store.put(email, otp)
+
+    # Delivered over the shared SMTP connection in the background, with retries
     try:
-        # Email setup (same as before)
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_SENDER
-        msg['To'] = email
-        msg['Subject'] = "Your OTP Code"
-        msg.attach(MIMEText(message, 'plain'))
-
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(EMAIL_SENDER, EMAIL_APP_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-
-        otp_store[email] = {
-            "otp": otp,
-            "expires_at": time.time() + 60
-        }
+        get_dispatcher().send_email(email, "Your OTP Code", message)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Failed to send email: too many pending messages")
 
-        return {"success": True}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to send email: {e}")
+    return {"success": True}
 
 
 class OTPVerificationRequest(BaseModel):
@@ -125,18 +95,19 @@ def verify_otp(payload: OTPVerificationRequest):
     if not key:
         raise HTTPException(status_code=400, detail="Phone or email required")
 
-    otp_entry = otp_store.get(key)
-    if not otp_entry:
+    status = otp_store.verify(key, payload.otp)
+    if status == otp_backends.NOT_FOUND:
         raise HTTPException(status_code=404, detail="OTP not found")
 
-    if time.time() > otp_entry["expires_at"]:
-        del otp_store[key]
+    if status == otp_backends.EXPIRED:
         raise HTTPException(status_code=410, detail="OTP expired")
 
-    if otp_entry["otp"] != payload.otp:
+    if status == otp_backends.TOO_MANY_ATTEMPTS:
+        raise HTTPException(status_code=429, detail="Too many attempts, request a new OTP")
+
+    if status == otp_backends.INVALID:
         raise HTTPException(status_code=401, detail="Invalid OTP")
 
-    del otp_store[key]
     return {"success": True, "message": "OTP verified"}
 
 
@@ -145,36 +116,24 @@ class ResetPasswordRequest(BaseModel):
     email: str | None = None
     new_password: str = Field(..., min_length=8)
 
-@router.post("/reset_password")
-def reset_password(data: ResetPasswordRequest):
-    print("🔐 Reset request for:", data.phone or data.email)
-    if not data.phone and not data.email:
-        raise HTTPException(status_code=400, detail="Phone or email is required")
-
+def update_password(data: ResetPasswordRequest, hashed_password: str):
     conn = get_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Database connection failed")
 
-    cursor = conn.cursor()
+    cursor = conn.cursor(dictionary=True)
     try:
         # Determine lookup field
         if data.phone:
-            cursor.execute("SELECT * FROM lecturer WHERE phone_number = %s", (data.phone,))
+            user = find_lecturer(cursor, phone=data.phone, columns=("Lecturer_ID",))
         else:
-            cursor.execute("SELECT * FROM lecturer WHERE email = %s", (data.email,))
-        
-        user = cursor.fetchone()
+            user = find_lecturer(cursor, email=data.email, columns=("Lecturer_ID",))
+
         if not user:
             raise HTTPException(status_code=404, detail="Lecturer not found")
 
-        # Hash password
-        hashed_password = pwd_context.hash(data.new_password)
-
         # Update password
-        if data.phone:
-            cursor.execute("UPDATE lecturer SET password = %s WHERE phone_number = %s", (hashed_password, data.phone))
-        else:
-            cursor.execute("UPDATE lecturer SET password = %s WHERE email = %s", (hashed_password, data.email))
+        cursor.execute("UPDATE lecturer SET password = %s WHERE Lecturer_ID = %s", (hashed_password, user["Lecturer_ID"]))
 
         conn.commit()
         return {"success": True, "message": "Password updated successfully"}
@@ -184,3 +143,14 @@ def reset_password(data: ResetPasswordRequest):
     finally:
         cursor.close()
         conn.close()
+
+@router.post("/reset_password")
+async def reset_password(data: ResetPasswordRequest):
+    print("🔐 Reset request for:", data.phone or data.email)
+    if not data.phone and not data.email:
+        raise HTTPException(status_code=400, detail="Phone or email is required")
+
+    # Hash on the dedicated password-hashing pool, same format/cost as /register
+    hashed_password = await hash_password(data.new_password)
+
+    return await run_in_pool("auth", update_password, data, hashed_password)
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, Query
 from database import get_connection
+from executors import bulkhead_route
+from identity import forget_unknown
 from pydantic import BaseModel
 
-router = APIRouter(prefix="/api_profile", tags=["Profiles"])
+router = APIRouter(prefix="/api_profile", tags=["Profiles"], route_class=bulkhead_route("auth"))
 
 @router.get("/lecturer_info")
 def get_lecturer_info(lecturer_id: str = Query(...)):
@@ -61,6 +63,7 @@ def update_lecturer_profile(lecturer_id: str, update_data: LecturerUpdateRequest
             lecturer_id
         ))
         conn.commit()
+        forget_unknown(email=update_data.email, phone=update_data.phone)
 
         return {"success": True, "message": "Lecturer profile updated successfully."}
     except Exception as e:
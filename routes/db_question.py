@@ -1,11 +1,13 @@
 # db_question.py
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel
 from typing import Optional
 from database import get_connection
+from executors import bulkhead_route
+from response_cache import cached_json, invalidate
 
-router = APIRouter(prefix="/api_question", tags=["Questions"])
+router = APIRouter(prefix="/api_question", tags=["Questions"], route_class=bulkhead_route("crud"))
 
 @router.get("/test")
 def test_question_route():
@@ -13,7 +15,11 @@ def test_question_route():
 
 # Get questions by exam_id
 @router.get("/questions")
-def get_questions_by_exam(exam_id: str = Query(...)):
+def get_questions_by_exam(request: Request, exam_id: str = Query(...)):
+    return cached_json(request, "questions", lambda: fetch_questions(exam_id))
+
+
+def fetch_questions(exam_id):
     conn = get_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -62,6 +68,7 @@ def add_question(question: QuestionCreate):
         """, (next_id, question.exam_id, question.question_text, question.marks))
 
         conn.commit()
+        invalidate("questions")
         return {"success": True, "message": "Question added", "question_id": next_id}
     finally:
         cursor.close()
@@ -86,6 +93,7 @@ def update_question(question_id: str, question: QuestionUpdate):
         conn.commit()
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Question not found")
+        invalidate("questions")
         return {"success": True, "message": "Question updated"}
     finally:
         cursor.close()
@@ -103,6 +111,7 @@ def delete_question(question_id: str):
         conn.commit()
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Question not found")
+        invalidate("questions")
         return {"success": True, "message": "Question deleted"}
     finally:
         cursor.close()
@@ -1,10 +1,16 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Query
 from database import get_connection
+from executors import bulkhead_route
+from serialization import COLUMNAR, list_response
+from activity import feed
 
-router = APIRouter(prefix="/api_result", tags=["Results"])
+router = APIRouter(prefix="/api_result", tags=["Results"], route_class=bulkhead_route("crud"))
 
 @router.get("/by_lecturer")
-def get_results_by_lecturer(lecturer_id: str = Query(...)):
+def get_results_by_lecturer(lecturer_id: str = Query(...), format: Optional[str] = Query(None)):
+    if format not in (None, COLUMNAR):
+        raise HTTPException(status_code=400, detail=f"Unknown format, use '{COLUMNAR}' or leave it out")
     conn = get_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -27,7 +33,7 @@ def get_results_by_lecturer(lecturer_id: str = Query(...)):
             ORDER BY CAST(SUBSTRING(r.Result_ID, 3) AS UNSIGNED) ASC
         """, (lecturer_id,))
         data = cursor.fetchall()
-        return {"success": True, "data": data}
+        return list_response(data, format)
     finally:
         cursor.close()
         conn.close()
@@ -48,7 +54,8 @@ def get_result_by_result_id(result_id: str = Query(...)):
                 s.Phone_Number AS phone_number,
                 r.Score AS score,
                 r.Summary AS summary,
-                a.Timestamp AS timestamp
+                a.Timestamp AS timestamp,
+                a.Content_Hash AS content_hash
             FROM result r
             JOIN answer_submission a ON r.Submission_ID = a.Submission_ID
             JOIN student s ON a.Student_ID = s.Student_ID
@@ -60,6 +67,7 @@ def get_result_by_result_id(result_id: str = Query(...)):
         result = cursor.fetchone()
         if not result:
             raise HTTPException(status_code=404, detail="Result not found")
+        result["image_url"] = f"/api_image/{result['content_hash']}" if result["content_hash"] else None
         return {"success": True, "data": result}
     finally:
         cursor.close()
@@ -74,23 +82,19 @@ def get_results_by_lecturer5(lecturer_id: str = Query(...)):
 
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("""
-            SELECT 
-                r.Result_ID AS result_id,
-                s.Student_ID AS student_id,
-                s.Matrix_Number AS matrix_number,
-                c.Class_Name AS class_name,
-                a.Timestamp AS timestamp,
-                r.Score AS score
-            FROM result r
-            JOIN answer_submission a ON r.Submission_ID = a.Submission_ID
-            JOIN student s ON a.Student_ID = s.Student_ID
-            JOIN class c ON s.Class_ID = c.Class_ID
-            WHERE c.Lecturer_ID = %s
-            ORDER BY a.Timestamp DESC
-            LIMIT 5
-        """, (lecturer_id,))
-        data = cursor.fetchall()
+        # first page of the graded-submissions activity feed, in the old shape
+        events, _ = feed(cursor, lecturer_id, 5, kinds=("submission",), graded_only=True)
+        data = [
+            {
+                "result_id": e["result_id"],
+                "student_id": e["student_id"],
+                "matrix_number": e["matrix_number"],
+                "class_name": e["class_name"],
+                "timestamp": e["timestamp"],
+                "score": e["score"],
+            }
+            for e in events
+        ]
         return {"success": True, "data": data}
     finally:
         cursor.close()
@@ -1,11 +1,13 @@
 # db_scheme.py
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel
 from typing import Optional
 from database import get_connection
+from executors import bulkhead_route
+from response_cache import cached_json, invalidate
 
-router = APIRouter(prefix="/api_scheme", tags=["Schemes"])
+router = APIRouter(prefix="/api_scheme", tags=["Schemes"], route_class=bulkhead_route("crud"))
 
 # --- Models ---
 
@@ -22,7 +24,11 @@ class SchemeUpdate(BaseModel):
 
 # Get all schemes for a specific question
 @router.get("/schemes")
-def get_schemes_by_question(question_id: str = Query(...)):
+def get_schemes_by_question(request: Request, question_id: str = Query(...)):
+    return cached_json(request, "schemes", lambda: fetch_schemes(question_id))
+
+
+def fetch_schemes(question_id):
     conn = get_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -65,6 +71,7 @@ def add_scheme(scheme: SchemeCreate):
             VALUES (%s, %s, %s, %s)
         """, (next_id, scheme.question_id, scheme.scheme_text, scheme.marks))
         conn.commit()
+        invalidate("schemes")
         return {"success": True, "message": "Scheme added", "scheme_id": next_id}
     finally:
         cursor.close()
@@ -104,6 +111,7 @@ def update_scheme(scheme_id: str, scheme: SchemeUpdate):
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Scheme not found")
 
+        invalidate("schemes")
         return {"success": True, "message": "Scheme updated"}
     finally:
         cursor.close()
@@ -123,6 +131,7 @@ def delete_scheme(scheme_id: str):
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Scheme not found")
 
+        invalidate("schemes")
         return {"success": True, "message": "Scheme deleted"}
     finally:
         cursor.close()
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi import APIRouter, HTTPException, Path, Query, Request
 from pydantic import BaseModel
 from database import get_connection
+from executors import bulkhead_route
+from response_cache import cached_json, invalidate
 
-router = APIRouter(prefix="/api_student", tags=["Students"])
+router = APIRouter(prefix="/api_student", tags=["Students"], route_class=bulkhead_route("crud"))
 
 @router.get("/students")
-def get_students_by_class(class_id: str = Query(...)):
+def get_students_by_class(request: Request, class_id: str = Query(...)):
+    return cached_json(request, "students", lambda: fetch_students(class_id))
+
+
+def fetch_students(class_id):
     conn = get_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Database connection failed")
@@ -61,6 +67,7 @@ def add_student(student: StudentCreate):
             VALUES (%s, %s, %s, %s)
         """, (next_id, student.class_id, student.matrix, student.phone))
         conn.commit()
+        invalidate("students")
 
         return {"success": True, "message": "Student added", "student_id": next_id}
     except Exception as e:
@@ -108,11 +115,19 @@ def update_student(student_id: str, student: StudentUpdate):
             SET Class_ID=%s, Matrix_Number=%s, Phone_Number=%s
             WHERE Student_ID=%s
         """, (student.class_id, student.matrix, student.phone, student_id))
-        conn.commit()
-
         if cursor.rowcount == 0:
+            conn.rollback()
             raise HTTPException(status_code=404, detail="Student not found")
 
+        # keep the lecturer copied onto the student's submissions in step with the class
+        cursor.execute("""
+            UPDATE answer_submission
+            SET Lecturer_ID = (SELECT Lecturer_ID FROM class WHERE Class_ID = %s)
+            WHERE Student_ID = %s
+        """, (student.class_id, student_id))
+        conn.commit()
+
+        invalidate("students")
         return {"success": True, "message": "Student updated"}
     finally:
         cursor.close()
@@ -129,6 +144,7 @@ def delete_student(student_id: str):
         conn.commit()
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Student not found")
+        invalidate("students")
         return {"success": True, "message": "Student deleted"}
     finally:
         cursor.close()
@@ -1,23 +1,113 @@
 # In routes/answer_submission.py (new or existing file)
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, UploadFile, File, Form
 from pydantic import BaseModel
+from typing import List, Optional
 from datetime import datetime
-from database import get_connection
+import json
+from mysql.connector import IntegrityError, errorcode
+from database import allocate_ids, get_connection
+from executors import bulkhead_route, run_in_pool
+from idempotency import fingerprint, idempotent
+from uploads import read_upload
+import blob_store
+from grading import (
+    grade_text, load_exam_schemes, outcome_rows, read_answer_text, save_outcomes, score_value, summarize
+)
+from regrade import regrade_exam
 
-router = APIRouter(prefix="/api_submission", tags=["Answer Submission"])
+router = APIRouter(prefix="/api_submission", tags=["Answer Submission"], route_class=bulkhead_route("crud"))
 
 class Submission(BaseModel):
     student_id: str
     exam_id: str
     uploaded_folder: str
+    # "content_hash" from /api_scan/upload; the same image is recorded once per
+    # student and exam, and the OCR text kept for regrading is looked up by it
+    content_hash: Optional[str] = None
+    # "extracted_text" from /api_scan/upload; only stored when the server has no
+    # OCR text for content_hash (older clients send neither)
+    ocr_text: Optional[str] = None
+
+class SchemeOutcome(BaseModel):
+    # one entry of the "results" list /api_scan/upload returns
+    scheme_id: str
+    similarity: float = 0
+    awarded_marks: float
+    expected_marks: float
 
 class ResultInput(BaseModel):
     submission_id: str
     score: str
     summary: str
+    outcomes: Optional[List[SchemeOutcome]] = None
+
+    def totals(self):
+        """(awarded, possible) for the numeric score columns."""
+        possible = sum(o.expected_marks for o in self.outcomes) if self.outcomes else None
+        return score_value(self.score), possible
+
+    def scheme_rows(self, result_id):
+        return [
+            (result_id, o.scheme_id, round(o.similarity), o.awarded_marks, o.expected_marks)
+            for o in self.outcomes or []
+        ]
+
+class ResultBatch(BaseModel):
+    results: List[ResultInput]
+
+# Lecturer_ID is copied onto each submission for the activity feed
+LECTURER_OF_STUDENT = """(
+    SELECT c.Lecturer_ID FROM student s JOIN class c ON c.Class_ID = s.Class_ID WHERE s.Student_ID = %s
+)"""
+
+# The text /api_scan/upload OCR'd from the image, rather than whatever the client sends back
+OCR_TEXT_OF_CONTENT = """COALESCE(
+    (SELECT oc.OCR_Text FROM ocr_cache oc WHERE oc.Content_Hash = %s), %s
+)"""
+
+# upper bound on one /confirm_bulk request, a few classes' worth of scripts
+MAX_BULK_RESULTS = 1000
+
+def find_duplicate(cursor, student_id, exam_id, content_hash):
+    """The submission (and its result, if any) already recorded for this image, or None."""
+    if not content_hash:
+        return None
+    cursor.execute("""
+        SELECT a.Submission_ID AS submission_id, r.Result_ID AS result_id, r.Score AS score
+        FROM answer_submission a
+        LEFT JOIN result r ON r.Submission_ID = a.Submission_ID
+        WHERE a.Student_ID = %s AND a.Exam_ID = %s AND a.Content_Hash = %s
+        LIMIT 1
+    """, (student_id, exam_id, content_hash))
+    return cursor.fetchone()
+
+
+def duplicate_response(existing):
+    return {"success": True, "duplicate": True, "message": "This script was already submitted", **existing}
+
+
+def is_duplicate_content(error):
+    return error.errno == errorcode.ER_DUP_ENTRY and "uq_submission_content" in str(error)
+
+
+def lookup_duplicate(student_id, exam_id, content_hash):
+    conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="DB connection failed")
+    cursor = conn.cursor(dictionary=True)
+    try:
+        return find_duplicate(cursor, student_id, exam_id, content_hash)
+    finally:
+        cursor.close()
+        conn.close()
+
 
 @router.post("/submit")
-def insert_submission(data: Submission):
+async def insert_submission(request: Request, data: Submission):
+    return await idempotent(request, fingerprint(data.dict()), lambda: run_in_pool("crud", save_submission, data))
+
+
+def save_submission(data: Submission):
     print(f"Received student_id: {data.student_id}")  # <-- Print the student_id here
     conn = get_connection()
     if not conn:
@@ -25,59 +115,227 @@ def insert_submission(data: Submission):
     cursor = conn.cursor(dictionary=True)
 
     try:
-        # Generate next Submission_ID in format SUB001, SUB002, ...
-        cursor.execute("SELECT Submission_ID FROM answer_submission ORDER BY Submission_ID DESC LIMIT 1")
-        last = cursor.fetchone()
-
-        if last and last['Submission_ID'].startswith("SUB"):
-            last_num = int(last['Submission_ID'][3:])
-            next_id = f"SUB{last_num + 1:03d}"
-        else:
-            next_id = "SUB001"
-
-        cursor.execute("""
-            INSERT INTO answer_submission (Submission_ID, Student_ID, Exam_ID, Uploaded_Folder, Timestamp)
-            VALUES (%s, %s, %s, %s, %s)
+        existing = find_duplicate(cursor, data.student_id, data.exam_id, data.content_hash)
+        if existing:
+            return duplicate_response(existing)
+
+        # Next Submission_ID (SUB001, SUB002, ...), locked like the bulk and graded paths allocate them
+        next_id = allocate_ids(cursor, "answer_submission", "Submission_ID", "SUB")[0]
+
+        cursor.execute(f"""
+            INSERT INTO answer_submission
+                (Submission_ID, Student_ID, Exam_ID, Uploaded_Folder, Timestamp, OCR_Text, Content_Hash, Lecturer_ID)
+            VALUES (%s, %s, %s, %s, %s, {OCR_TEXT_OF_CONTENT}, %s, {LECTURER_OF_STUDENT})
         """, (
             next_id,
             data.student_id,
             data.exam_id,
             data.uploaded_folder,
-            datetime.now()
+            datetime.now(),
+            data.content_hash,
+            data.ocr_text,
+            data.content_hash,
+            data.student_id
         ))
         conn.commit()
         return {"success": True, "message": "Submission inserted", "submission_id": next_id}
+    except IntegrityError as e:
+        conn.rollback()
+        if not is_duplicate_content(e):
+            raise
+        # the same image was submitted concurrently
+        return duplicate_response(find_duplicate(cursor, data.student_id, data.exam_id, data.content_hash))
     finally:
         cursor.close()
         conn.close()
 
 @router.post("/confirm")
-def insert_result(data: ResultInput):
+async def insert_result(request: Request, data: ResultInput):
+    return await idempotent(request, fingerprint(data.dict()), lambda: run_in_pool("crud", save_result, data))
+
+
+def save_result(data: ResultInput):
     conn = get_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="DB connection failed")
     cursor = conn.cursor(dictionary=True)
 
     try:
-        # Generate next Result_ID: RS001, RS002, ...
-        cursor.execute("SELECT Result_ID FROM result ORDER BY Result_ID DESC LIMIT 1")
-        last = cursor.fetchone()
-        if last and last["Result_ID"].startswith("RS"):
-            last_num = int(last["Result_ID"][2:])
-            next_id = f"RS{last_num + 1:03d}"
-        else:
-            next_id = "RS001"
+        # Next Result_ID (RS001, RS002, ...); the lock keeps it out of a concurrent /confirm_bulk's block
+        next_id = allocate_ids(cursor, "result", "Result_ID", "RS")[0]
 
         cursor.execute(
             """
-            INSERT INTO result (Result_ID, Submission_ID, Score, Summary)
-            VALUES (%s, %s, %s, %s)
+            INSERT INTO result (Result_ID, Submission_ID, Score, Summary, Awarded_Marks, Possible_Marks)
+            VALUES (%s, %s, %s, %s, %s, %s)
             """,
-            (next_id, data.submission_id, data.score, data.summary)
+            (next_id, data.submission_id, data.score, data.summary, *data.totals())
         )
+        save_outcomes(cursor, data.scheme_rows(next_id))
         conn.commit()
 
         return {"success": True, "message": "Result inserted", "result_id": next_id}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+@router.post("/confirm_bulk")
+async def insert_results_bulk(request: Request, data: ResultBatch):
+    """Confirms many results at once: one id allocation, one executemany, one commit."""
+    return await idempotent(request, fingerprint(data.dict()), lambda: run_in_pool("crud", save_results_bulk, data))
+
+
+def save_results_bulk(data: ResultBatch):
+    if not data.results:
+        raise HTTPException(status_code=400, detail="No results to confirm")
+    if len(data.results) > MAX_BULK_RESULTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_RESULTS} results per request")
+
+    conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="DB connection failed")
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        result_ids = allocate_ids(cursor, "result", "Result_ID", "RS", len(data.results))
+        cursor.executemany(
+            """
+            INSERT INTO result (Result_ID, Submission_ID, Score, Summary, Awarded_Marks, Possible_Marks)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            [(result_id, r.submission_id, r.score, r.summary, *r.totals()) for result_id, r in zip(result_ids, data.results)]
+        )
+        save_outcomes(cursor, [row for result_id, r in zip(result_ids, data.results) for row in r.scheme_rows(result_id)])
+        conn.commit()
+
+        return {
+            "success": True,
+            "message": f"{len(result_ids)} results inserted",
+            "results": [
+                {"submission_id": r.submission_id, "result_id": result_id}
+                for result_id, r in zip(result_ids, data.results)
+            ]
+        }
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def save_graded_submission(student_id, exam_id, uploaded_folder, extracted_text, schemes, content_hash=None):
+    """Grades the text and records submission + result in one transaction on one connection."""
+    conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="DB connection failed")
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        if schemes is None:
+            schemes = load_exam_schemes(cursor, exam_id)
+            if not schemes:
+                raise HTTPException(status_code=404, detail="Exam has no schemes to grade against")
+
+        grading = grade_text(extracted_text, schemes)
+        score = str(grading["total_awarded_marks"])
+
+        submission_id = allocate_ids(cursor, "answer_submission", "Submission_ID", "SUB")[0]
+        cursor.execute(f"""
+            INSERT INTO answer_submission
+                (Submission_ID, Student_ID, Exam_ID, Uploaded_Folder, Timestamp, OCR_Text, Content_Hash, Lecturer_ID)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, {LECTURER_OF_STUDENT})
+        """, (submission_id, student_id, exam_id, uploaded_folder, datetime.now(), extracted_text, content_hash,
+              student_id))
+
+        result_id = allocate_ids(cursor, "result", "Result_ID", "RS")[0]
+        cursor.execute(
+            """
+            INSERT INTO result (Result_ID, Submission_ID, Score, Summary, Awarded_Marks, Possible_Marks)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            (result_id, submission_id, score, summarize(grading),
+             grading["total_awarded_marks"], grading["total_possible_marks"])
+        )
+        save_outcomes(cursor, outcome_rows(result_id, grading["results"]))
+        conn.commit()
+
+        return {
+            "success": True,
+            "message": "Submission graded",
+            "submission_id": submission_id,
+            "result_id": result_id,
+            "score": score,
+            "image_url": f"/api_image/{content_hash}" if content_hash else None,
+            **grading
+        }
+    except IntegrityError as e:
+        conn.rollback()
+        if not is_duplicate_content(e):
+            raise
+        return duplicate_response(find_duplicate(cursor, student_id, exam_id, content_hash))
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+
+@router.post("/submit_graded")
+async def submit_graded(
+    request: Request,
+    file: UploadFile = File(...),
+    student_id: str = Form(...),
+    exam_id: str = Form(...),
+    uploaded_folder: Optional[str] = Form(None),
+    schemes_json: Optional[str] = Form(None)
+):
+    """
+    /api_scan/upload, /submit and /confirm in one request: OCRs the answer,
+    grades it against the selected schemes (all of the exam's when none are
+    sent) and stores the submission and its result atomically.
+    """
+    schemes = None
+    if schemes_json:
+        try:
+            schemes = json.loads(schemes_json)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="schemes_json is not valid JSON")
+
+    with await read_upload(file) as upload:
+        async def grade_and_save():
+            # a re-sent image skips OCR and grading altogether
+            existing = await run_in_pool("crud", lookup_duplicate, student_id, exam_id, upload.sha256)
+            if existing:
+                return duplicate_response(existing)
+
+            await run_in_pool("ocr", blob_store.put, upload)
+            try:
+                extracted_text = await read_answer_text(upload)
+            except HTTPException:
+                raise
+            except Exception as e:
+                print("OCR error:", str(e))
+                raise HTTPException(status_code=500, detail="OCR processing failed")
+
+            return await run_in_pool(
+                "crud", save_graded_submission,
+                student_id, exam_id, uploaded_folder or file.filename, extracted_text, schemes, upload.sha256
+            )
+
+        request_hash = fingerprint(upload.sha256, student_id, exam_id, uploaded_folder, schemes_json)
+        return await idempotent(request, request_hash, grade_and_save)
+
+
+@router.post("/regrade")
+async def regrade(exam_id: str = Query(...)):
+    """
+    Regrades every result of the exam against its current schemes, from the
+    OCR text stored with each submission. Call after editing schemes.
+    """
+    summary = await run_in_pool("analytics", regrade_exam, exam_id)
+    return {"success": True, **summary}
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr, Field
+from mysql.connector import IntegrityError, errorcode
 from database import get_connection
-import bcrypt
+from executors import bulkhead_route, run_in_pool
+from identity import existing_identifiers, forget_unknown
+from passwords import hash_password
 
-router = APIRouter()
+router = APIRouter(route_class=bulkhead_route("auth"))
+
+ID_RETRIES = 3
 
 class RegisterRequest(BaseModel):
     full_name: str = Field(alias="Lecturer_Name")
@@ -15,49 +20,47 @@ class RegisterRequest(BaseModel):
     class Config:
         allow_population_by_field_name = True
 
-@router.post("/register")
-def register(data: RegisterRequest):
-    conn = get_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-
-    cursor = conn.cursor(dictionary=True)
-
-    # Check if email exists
-    cursor.execute("SELECT * FROM lecturer WHERE email = %s", (data.email,))
-    email_exists = cursor.fetchone()
-
-    # Check if phone exists
-    cursor.execute("SELECT * FROM lecturer WHERE phone_number = %s", (data.phone,))
-    phone_exists = cursor.fetchone()
-
-    cursor.close()
-    conn.close()
-
+def duplicate_error(cursor, data: RegisterRequest):
+    email_exists, phone_exists = existing_identifiers(cursor, data.email, data.phone)
     if email_exists and phone_exists:
-        raise HTTPException(status_code=409, detail="Email and Phone number already registered")
+        return HTTPException(status_code=409, detail="Email and Phone number already registered")
     elif email_exists:
-        raise HTTPException(status_code=409, detail="Email already registered")
+        return HTTPException(status_code=409, detail="Email already registered")
     elif phone_exists:
-        raise HTTPException(status_code=409, detail="Phone number already registered")
+        return HTTPException(status_code=409, detail="Phone number already registered")
+    return HTTPException(status_code=409, detail="Lecturer already registered")
 
+def insert_lecturer(data: RegisterRequest, hashed_password: str):
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    cursor.execute("SELECT lecturer_id FROM lecturer ORDER BY lecturer_id DESC LIMIT 1")
-    last = cursor.fetchone()
-    new_id = f"L{(int(last['lecturer_id'][1:]) + 1) if last else 1:03}"
-
-    # Truncate password to 72 bytes and hash with bcrypt
-    password_bytes = data.password.encode('utf-8')[:72]
-    hashed_password = bcrypt.hashpw(password_bytes, bcrypt.gensalt()).decode('utf-8')
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
 
+    cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("""
-            INSERT INTO lecturer (lecturer_id, lecturer_name, email, password, phone_number, institution_name)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (new_id, data.full_name, data.email, hashed_password, data.phone, data.institution))
-        conn.commit()
+        # Duplicate emails / phone numbers are rejected by the unique indexes on
+        # lecturer, so there is no separate existence check. A duplicate primary
+        # key means another registration took the same id: allocate the next one.
+        for _ in range(ID_RETRIES):
+            cursor.execute("SELECT lecturer_id FROM lecturer ORDER BY lecturer_id DESC LIMIT 1")
+            last = cursor.fetchone()
+            new_id = f"L{(int(last['lecturer_id'][1:]) + 1) if last else 1:03}"
+            try:
+                cursor.execute("""
+                    INSERT INTO lecturer (lecturer_id, lecturer_name, email, password, phone_number, institution_name)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (new_id, data.full_name, data.email, hashed_password, data.phone, data.institution))
+                conn.commit()
+                break
+            except IntegrityError as e:
+                conn.rollback()
+                if e.errno != errorcode.ER_DUP_ENTRY:
+                    raise
+                if "PRIMARY" not in str(e):
+                    raise duplicate_error(cursor, data)
+        else:
+            raise HTTPException(status_code=503, detail="Registration failed: could not allocate a lecturer id")
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=f"Registration failed: {e}")
@@ -65,4 +68,14 @@ def register(data: RegisterRequest):
         cursor.close()
         conn.close()
 
-    return {"success": True, "message": "Registration successful", "lecturer_id": new_id}
\ No newline at end of file
+    forget_unknown(email=data.email, phone=data.phone)
+    return new_id
+
+@router.post("/register")
+async def register(data: RegisterRequest):
+    # Hash on the dedicated password-hashing pool (bcrypt truncates to 72 bytes)
+    hashed_password = await hash_password(data.password)
+
+    new_id = await run_in_pool("auth", insert_lecturer, data, hashed_password)
+
+    return {"success": True, "message": "Registration successful", "lecturer_id": new_id}
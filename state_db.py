@@ -0,0 +1,24 @@
+import os
+import sqlite3
+import tempfile
+import threading
+
+# Small SQLite file shared by every uvicorn worker on the host, for state that
+# must be visible across workers but doesn't belong in MySQL (OTPs, counters).
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", os.path.join(tempfile.gettempdir(), "gradingbot_state.sqlite3"))
+
+_local = threading.local()
+
+
+def get_state_connection(path=STATE_DB_PATH):
+    """Returns this thread's connection to the shared state file (autocommit, WAL)."""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conns[path] = conn
+    return conn
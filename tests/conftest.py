@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# The app's modules live at the repo root and are imported by name.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the shared state file of anything a test touches out of the real one.
+os.environ.setdefault("STATE_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="gradingbot_tests_"), "state.sqlite3"))
+
+
+class Clock:
+    """Stands in for time.monotonic and time.time; tests move it by changing `now`."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """fake_clock(module) patches the clock `module` reads through its `time` import and returns it."""
+    def patch(module, now=1000.0):
+        clock = Clock(now)
+        monkeypatch.setattr(module.time, "monotonic", clock)
+        monkeypatch.setattr(module.time, "time", clock)
+        return clock
+    return patch
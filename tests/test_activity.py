@@ -0,0 +1,112 @@
+import datetime
+import sqlite3
+import pytest
+import activity
+
+T0 = datetime.datetime(2025, 3, 1, 9, 0, 0)
+
+
+def _events():
+    """Exams and submissions with timestamps shared inside and across kinds."""
+    events = []
+    for n in range(6):
+        events.append(("exam", T0 - datetime.timedelta(minutes=n // 2), f"E{n:03d}"))
+    for n in range(9):
+        events.append(("submission", T0 - datetime.timedelta(minutes=n // 3), f"SUB{n:03d}"))
+    return events
+
+
+def _feed_order(events):
+    # (timestamp DESC, kind ASC, id DESC), as the UNION ALL query orders them
+    by_id = sorted(events, key=lambda e: e[2], reverse=True)
+    by_kind = sorted(by_id, key=lambda e: e[0])
+    return sorted(by_kind, key=lambda e: e[1], reverse=True)
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE events (kind TEXT, at TEXT, id TEXT)")
+    conn.executemany("INSERT INTO events VALUES (?, ?, ?)", [(k, at.isoformat(" "), i) for k, at, i in _events()])
+    yield conn
+    conn.close()
+
+
+def _page(db, after, limit):
+    """One page the way activity._page builds it: each kind filtered by _after, then merged."""
+    rows = []
+    for kind in activity.KINDS:
+        condition, params = activity._after(kind, "at", "id", after)
+        params = [p.isoformat(" ") if isinstance(p, datetime.datetime) else p for p in params]
+        rows += [
+            (k, datetime.datetime.fromisoformat(at), i)
+            for k, at, i in db.execute(f"SELECT kind, at, id FROM events WHERE kind = ?{condition.replace('%s', '?')}",
+                                       [kind, *params])
+        ]
+    return _feed_order(rows)[:limit]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 7, 20])
+def test_paging_visits_every_event_once_in_feed_order(db, limit):
+    seen, after = [], None
+    while True:
+        page = _page(db, after, limit)
+        if not page:
+            break
+        seen += page
+        last = {"kind": page[-1][0], "timestamp": page[-1][1], "id": page[-1][2]}
+        after = activity.decode_cursor(activity.encode_cursor(last))
+    assert seen == _feed_order(_events())
+
+
+def test_after_keeps_same_timestamp_rows_of_later_kinds_only():
+    # cursor on an exam: submissions at the same instant still follow it, earlier exams don't
+    assert activity._after("submission", "at", "id", (T0, "exam", "E001")) == (" AND at <= %s", [T0])
+    assert activity._after("exam", "at", "id", (T0, "submission", "SUB001")) == (" AND at < %s", [T0])
+    condition, params = activity._after("exam", "at", "id", (T0, "exam", "E001"))
+    assert condition == " AND (at < %s OR (at = %s AND id < %s))"
+    assert params == [T0, T0, "E001"]
+    assert activity._after("exam", "at", "id", None) == ("", [])
+
+
+def test_cursor_round_trip():
+    event = {"kind": "submission", "timestamp": T0, "id": "SUB042"}
+    token = activity.encode_cursor(event)
+    assert "=" not in token
+    assert activity.decode_cursor(token) == (T0, "submission", "SUB042")
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "not-base64!",
+    activity.encode_cursor({"kind": "exam", "timestamp": T0, "id": "E1"})[:-3],
+    # well-formed but not something encode_cursor produces
+    "WyIyMDI1LTAzLTAxVDA5OjAwOjAwIiwgInJlc3VsdCIsICJSUzEiXQ",  # kind "result"
+    "WyIyMDI1LTAzLTAxVDA5OjAwOjAwIiwgImV4YW0iLCAxXQ",  # numeric id
+])
+def test_decode_cursor_rejects_foreign_tokens(token):
+    with pytest.raises(ValueError):
+        activity.decode_cursor(token)
+
+
+class _FakeCursor:
+    def __init__(self, page_rows):
+        self.page_rows = page_rows
+        self.results = []
+
+    def execute(self, sql, params=()):
+        self.results = self.page_rows if "UNION ALL" in sql or sql.lstrip().startswith("(SELECT") else []
+
+    def fetchall(self):
+        return self.results
+
+
+def test_feed_returns_a_cursor_only_when_there_is_more():
+    rows = [{"kind": k, "at": at, "id": i} for k, at, i in _feed_order(_events())[:4]]
+
+    events, next_cursor = activity.feed(_FakeCursor(rows), "L001", limit=3)
+    assert [e["id"] for e in events] == [r["id"] for r in rows[:3]]
+    assert activity.decode_cursor(next_cursor) == (rows[2]["at"], rows[2]["kind"], rows[2]["id"])
+
+    events, next_cursor = activity.feed(_FakeCursor(rows), "L001", limit=4)
+    assert len(events) == 4 and next_cursor is None
@@ -0,0 +1,90 @@
+import hashlib
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import blob_store
+from routes import db_image
+from routes.db_image import parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-199", (100, 199)),
+    ("bytes=900-", (900, 999)),
+    ("bytes=900-5000", (900, 999)),  # end clamped to the last byte
+    ("bytes=-100", (900, 999)),      # suffix: the last 100 bytes
+    ("bytes=-5000", (0, 999)),
+    ("bytes=999-999", (999, 999)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    "items=0-1",
+    "bytes=0-1,5-6",   # multipart ranges are answered with the whole file
+    "bytes=a-1",
+    "bytes=0-b",
+    "bytes=5-4",       # last before first: invalid, so ignored
+    "bytes=-x",
+    "bytes=-",
+])
+def test_missing_malformed_or_unsupported_ranges_mean_the_whole_file(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),
+    ("bytes=1000-1001", 1000),
+    ("bytes=-0", 1000),
+    ("bytes=0-", 0),
+    ("bytes=-5", 0),
+])
+def test_unsatisfiable_ranges_raise(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
+
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "BLOB_STORE_DIR", str(tmp_path))
+    content = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+    content_hash = hashlib.sha256(content).hexdigest()
+    path = blob_store.blob_path(content_hash)
+    blob_store._write_atomic(path, lambda f: f.write(content))
+    app = FastAPI()
+    app.include_router(db_image.router)
+    with TestClient(app) as client:
+        yield client, content, content_hash
+
+
+def test_download_whole_and_partial(stored):
+    client, content, content_hash = stored
+    url = f"/api_image/{content_hash}"
+
+    whole = client.get(url)
+    assert whole.status_code == 200
+    assert whole.content == content
+    assert whole.headers["content-type"] == "image/png"
+    assert whole.headers["etag"] == f'"{content_hash}"'
+
+    part = client.get(url, headers={"Range": "bytes=8-15"})
+    assert part.status_code == 206
+    assert part.content == content[8:16]
+    assert part.headers["content-range"] == f"bytes 8-15/{len(content)}"
+
+    stale = client.get(url, headers={"Range": "bytes=8-15", "If-Range": '"something-else"'})
+    assert stale.status_code == 200 and stale.content == content
+
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={len(content)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(content)}"
+
+    malformed = client.get(url, headers={"Range": "bytes=15-8"})
+    assert malformed.status_code == 200 and malformed.content == content
+
+    assert client.get(url, headers={"If-None-Match": f'"{content_hash}"'}).status_code == 304
+    assert client.get(f"/api_image/{'0' * 64}").status_code == 404
+    assert client.get("/api_image/not-a-hash").status_code == 404
@@ -0,0 +1,70 @@
+import pytest
+from exam_parser import parse_exam_markup
+
+
+def _dicts(text):
+    return [q.to_dict() for q in parse_exam_markup(text)]
+
+
+def test_questions_with_their_schemes():
+    text = """
+    <Question 1 marks="5">Define osmosis.</Question 1>
+    <Scheme 1 marks="2">movement of water</Scheme 1>
+    <Scheme 2 marks=3>across a partially permeable membrane</Scheme 2>
+    <Question 2 marks="2.5">Name an organelle.</Question 2>
+    <Scheme 1 marks="2.5">mitochondrion</Scheme 1>
+    """
+    assert _dicts(text) == [
+        {"question_no": 1, "question_text": "Define osmosis.", "marks": 5, "schemes": [
+            {"scheme_no": 1, "scheme_text": "movement of water", "marks": 2},
+            {"scheme_no": 2, "scheme_text": "across a partially permeable membrane", "marks": 3},
+        ]},
+        {"question_no": 2, "question_text": "Name an organelle.", "marks": 2.5, "schemes": [
+            {"scheme_no": 1, "scheme_text": "mitochondrion", "marks": 2.5},
+        ]},
+    ]
+
+
+def test_tags_are_case_and_space_insensitive():
+    text = '<question 3 MARKS = "4" >  Explain.  </ Question 3><SCHEME 1 marks=4>point</scheme 1>'
+    assert _dicts(text) == [{"question_no": 3, "question_text": "Explain.", "marks": 4, "schemes": [
+        {"scheme_no": 1, "scheme_text": "point", "marks": 4},
+    ]}]
+
+
+def test_schemes_inside_the_question_text_belong_to_it():
+    text = '<Question 1 marks="1">Why? <Scheme 1 marks="1">because</Scheme 1></Question 1>'
+    [question] = parse_exam_markup(text)
+    assert question.schemes[0].scheme_text == "because"
+    assert question.question_text.startswith("Why?")
+
+
+def test_unclosed_and_mismatched_tags_are_ignored():
+    text = """
+    <Question 1 marks="2">Closed.</Question 1>
+    <Scheme 1 marks="1">kept</Scheme 1>
+    <Scheme 2 marks="1">never closed
+    <Scheme 3 marks="1">closed by the wrong number</Scheme 4>
+    <Question 2 marks="1">never closed
+    <Scheme 1 marks="1">belongs to the unclosed question</Scheme 1>
+    """
+    assert _dicts(text) == [{"question_no": 1, "question_text": "Closed.", "marks": 2, "schemes": [
+        {"scheme_no": 1, "scheme_text": "kept", "marks": 1},
+    ]}]
+
+
+def test_schemes_before_any_question_are_dropped():
+    assert _dicts('<Scheme 1 marks="1">orphan</Scheme 1>') == []
+
+
+def test_offsets_point_into_the_text():
+    text = 'intro <Question 1 marks="1">Q</Question 1> <Scheme 1 marks="1">S</Scheme 1>'
+    [question] = parse_exam_markup(text)
+    assert text[question.start:question.end] == '<Question 1 marks="1">Q</Question 1>'
+    scheme = question.schemes[0]
+    assert text[scheme.start:scheme.end] == '<Scheme 1 marks="1">S</Scheme 1>'
+
+
+def test_marks_that_are_not_numbers_raise():
+    with pytest.raises(ValueError):
+        parse_exam_markup('<Question 1 marks="five">Q</Question 1>')
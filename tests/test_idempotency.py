@@ -0,0 +1,244 @@
+import asyncio
+import datetime
+import types
+import orjson
+import pytest
+from fastapi import HTTPException
+from mysql.connector import IntegrityError, errorcode
+import idempotency
+
+ENDPOINT = "/api_submission/confirm"
+
+
+class FakeTable:
+    """The idempotency_key rows, keyed by (Idem_Key, Endpoint)."""
+
+    def __init__(self):
+        self.rows = {}
+
+
+class FakeCursor:
+    """Runs the statements idempotency.py issues against a FakeTable."""
+
+    def __init__(self, table):
+        self.table = table
+        self.rowcount = 0
+        self._row = None
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        rows = self.table.rows
+        self.rowcount = 0
+        if sql.startswith("INSERT INTO idempotency_key"):
+            key, endpoint, request_hash, created_at, expires_at, locked_until, token = params
+            if (key, endpoint) in rows:
+                raise IntegrityError(msg="Duplicate entry", errno=errorcode.ER_DUP_ENTRY)
+            rows[(key, endpoint)] = {
+                "Request_Hash": request_hash, "Status_Code": None, "Response": None,
+                "Created_At": created_at, "Expires_At": expires_at,
+                "Locked_Until": locked_until, "Lease_Token": token,
+            }
+            self.rowcount = 1
+        elif sql.startswith("SELECT"):
+            row = rows.get(tuple(params))
+            self._row = dict(row) if row else None
+        elif sql.startswith("UPDATE idempotency_key SET Locked_Until"):
+            locked_until, token, key, endpoint, now = params
+            row = rows.get((key, endpoint))
+            if row and row["Status_Code"] is None and (row["Locked_Until"] is None or row["Locked_Until"] < now):
+                row.update(Locked_Until=locked_until, Lease_Token=token)
+                self.rowcount = 1
+        elif sql.startswith("UPDATE idempotency_key SET Status_Code"):
+            status_code, body, key, endpoint, token = params
+            row = rows.get((key, endpoint))
+            if row and row["Lease_Token"] == token:
+                row.update(Status_Code=status_code, Response=body, Locked_Until=None)
+                self.rowcount = 1
+        elif sql.startswith("DELETE FROM idempotency_key WHERE Expires_At"):
+            for key in [k for k, row in rows.items() if row["Expires_At"] < params[0]]:
+                del rows[key]
+        elif "Lease_Token" in sql:  # _release
+            key, endpoint, token = params
+            row = rows.get((key, endpoint))
+            if row and row["Lease_Token"] == token and row["Status_Code"] is None:
+                del rows[(key, endpoint)]
+                self.rowcount = 1
+        elif sql.startswith("DELETE FROM idempotency_key WHERE Idem_Key"):
+            self.rowcount = 1 if rows.pop(tuple(params), None) else 0
+        else:
+            raise AssertionError(f"unexpected statement: {sql}")
+
+    def fetchone(self):
+        return self._row
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, table):
+        self.table = table
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.table)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+T0 = datetime.datetime(2025, 3, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = FakeTable()
+    monkeypatch.setattr(idempotency, "get_connection", lambda: FakeConnection(table))
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_PURGE_RATE", 0)
+    return table
+
+
+@pytest.fixture
+def now(monkeypatch):
+    """Settable datetime.now() as idempotency.py sees it."""
+    current = [T0]
+
+    class FakeDateTime(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return current[0]
+
+    monkeypatch.setattr(idempotency, "datetime", types.SimpleNamespace(datetime=FakeDateTime,
+                                                                       timedelta=datetime.timedelta))
+
+    def advance(seconds):
+        current[0] += datetime.timedelta(seconds=seconds)
+    return advance
+
+
+def _status(error):
+    return error.value.status_code
+
+
+def test_completed_request_is_replayed(table, now):
+    token, stored = idempotency._claim("k1", ENDPOINT, "hash")
+    assert token and stored is None
+    idempotency._complete("k1", ENDPOINT, token, 200, '{"result_id": "RS001"}')
+
+    assert idempotency._claim("k1", ENDPOINT, "hash") == (None, (200, '{"result_id": "RS001"}'))
+
+
+def test_key_reused_for_another_request_is_rejected(table, now):
+    idempotency._claim("k1", ENDPOINT, "hash")
+    with pytest.raises(HTTPException) as error:
+        idempotency._claim("k1", ENDPOINT, "other hash")
+    assert _status(error) == 422
+
+
+def test_same_key_on_another_endpoint_is_independent(table, now):
+    idempotency._claim("k1", ENDPOINT, "hash")
+    token, stored = idempotency._claim("k1", "/api_submission/submit", "hash")
+    assert token and stored is None
+
+
+def test_in_progress_key_answers_409_while_the_lease_holds(table, now):
+    idempotency._claim("k1", ENDPOINT, "hash")
+    now(idempotency.IDEMPOTENCY_LEASE - 1)
+    with pytest.raises(HTTPException) as error:
+        idempotency._claim("k1", ENDPOINT, "hash")
+    assert _status(error) == 409
+
+
+def test_retry_takes_over_once_the_lease_lapses(table, now):
+    first, _ = idempotency._claim("k1", ENDPOINT, "hash")
+    now(idempotency.IDEMPOTENCY_LEASE + 1)
+    second, stored = idempotency._claim("k1", ENDPOINT, "hash")
+    assert stored is None and second not in (None, first)
+    # and the new holder's lease blocks a third attempt
+    with pytest.raises(HTTPException) as error:
+        idempotency._claim("k1", ENDPOINT, "hash")
+    assert _status(error) == 409
+
+
+def test_stale_holder_cannot_complete_or_release_after_a_takeover(table, now):
+    stale, _ = idempotency._claim("k1", ENDPOINT, "hash")
+    now(idempotency.IDEMPOTENCY_LEASE + 1)
+    current, _ = idempotency._claim("k1", ENDPOINT, "hash")
+
+    idempotency._complete("k1", ENDPOINT, stale, 200, '{"from": "stale"}')
+    idempotency._release("k1", ENDPOINT, stale)
+    assert table.rows[("k1", ENDPOINT)]["Status_Code"] is None
+
+    idempotency._complete("k1", ENDPOINT, current, 200, '{"from": "current"}')
+    assert idempotency._claim("k1", ENDPOINT, "hash") == (None, (200, '{"from": "current"}'))
+
+
+def test_rows_without_a_lease_can_be_taken_over(table, now):
+    # in-progress rows written before Locked_Until existed
+    token, _ = idempotency._claim("k1", ENDPOINT, "hash")
+    table.rows[("k1", ENDPOINT)].update(Locked_Until=None, Lease_Token=None)
+    new_token, stored = idempotency._claim("k1", ENDPOINT, "hash")
+    assert stored is None and new_token != token
+
+
+def test_expired_key_can_be_used_again(table, now):
+    token, _ = idempotency._claim("k1", ENDPOINT, "hash")
+    idempotency._complete("k1", ENDPOINT, token, 200, "{}")
+    now(idempotency.IDEMPOTENCY_TTL + 1)
+    token, stored = idempotency._claim("k1", ENDPOINT, "other hash")
+    assert token and stored is None
+
+
+def _request(key):
+    return types.SimpleNamespace(headers={idempotency.HEADER: key} if key else {},
+                                 url=types.SimpleNamespace(path=ENDPOINT))
+
+
+def test_idempotent_runs_once_and_replays(table, now):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return {"success": True, "result_id": f"RS{len(calls):03d}"}
+
+    async def twice():
+        first = await idempotency.idempotent(_request("k1"), "hash", call)
+        second = await idempotency.idempotent(_request("k1"), "hash", call)
+        return first, second
+
+    first, second = asyncio.run(twice())
+    assert first == {"success": True, "result_id": "RS001"}
+    assert len(calls) == 1
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert orjson.loads(second.body) == first
+
+
+def test_idempotent_releases_the_key_when_the_call_fails(table, now):
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise HTTPException(status_code=500, detail="DB connection failed")
+        return {"success": True}
+
+    async def retry():
+        with pytest.raises(HTTPException):
+            await idempotency.idempotent(_request("k1"), "hash", call)
+        return await idempotency.idempotent(_request("k1"), "hash", call)
+
+    assert asyncio.run(retry()) == {"success": True}
+    assert len(attempts) == 2
+
+
+def test_requests_without_a_key_just_run(table, now):
+    async def call():
+        return {"success": True}
+
+    assert asyncio.run(idempotency.idempotent(_request(None), "hash", call)) == {"success": True}
+    assert table.rows == {}
@@ -0,0 +1,81 @@
+import pytest
+import otp_store
+from otp_store import EXPIRED, INVALID, NOT_FOUND, OTP_EXPIRED_GRACE, OTP_MAX_ATTEMPTS, TOO_MANY_ATTEMPTS, VERIFIED
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(otp_store)
+
+
+@pytest.fixture
+def memory_store(clock):
+    store = otp_store.MemoryOTPStore(tick=1.0, slots=16)
+    store.start = lambda: None  # the tests drive sweep() themselves
+    return store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, clock, memory_store):
+    if request.param == "memory":
+        return memory_store
+    store = otp_store.SQLiteOTPStore()
+    otp_store.get_state_connection().execute("DELETE FROM otp")
+    return store
+
+
+def test_verify_consumes_the_otp(store):
+    store.put("a@example.com", "123456")
+    assert store.verify("a@example.com", "123456") == VERIFIED
+    assert store.verify("a@example.com", "123456") == NOT_FOUND
+
+
+def test_wrong_attempts_lock_the_otp_until_it_is_reissued(store):
+    store.put("a@example.com", "123456")
+    for _ in range(OTP_MAX_ATTEMPTS):
+        assert store.verify("a@example.com", "000000") == INVALID
+    assert store.verify("a@example.com", "123456") == TOO_MANY_ATTEMPTS
+
+    store.put("a@example.com", "654321")
+    assert store.verify("a@example.com", "654321") == VERIFIED
+
+
+def test_expired_otp_is_reported_then_gone(store, clock):
+    store.put("a@example.com", "123456", ttl=60)
+    clock.now += 61
+    assert store.verify("a@example.com", "123456") == EXPIRED
+    assert store.verify("a@example.com", "123456") == NOT_FOUND
+
+
+def _run_wheel(store, clock, seconds):
+    for _ in range(seconds):
+        clock.now += 1
+        store.sweep()
+
+
+def test_wheel_keeps_expired_entries_for_the_grace_period(memory_store, clock):
+    memory_store.put("a@example.com", "123456", ttl=5)
+    _run_wheel(memory_store, clock, 5 + OTP_EXPIRED_GRACE - 1)
+    # still there, longer than one turn of the 16-slot wheel, so "expired" rather than "not found"
+    assert len(memory_store) == 1
+    _run_wheel(memory_store, clock, 2)
+    assert len(memory_store) == 0
+
+
+def test_wheel_reschedules_a_reissued_key(memory_store, clock):
+    memory_store.put("a@example.com", "111111", ttl=5)
+    _run_wheel(memory_store, clock, 3)
+    memory_store.put("a@example.com", "222222", ttl=5)
+    # the first OTP's purge time passes, but the entry now holds the reissued one
+    _run_wheel(memory_store, clock, 5 + OTP_EXPIRED_GRACE - 2)
+    assert len(memory_store) == 1
+    _run_wheel(memory_store, clock, 4)
+    assert len(memory_store) == 0
+
+
+def test_wheel_only_touches_due_keys(memory_store, clock):
+    memory_store.put("short@example.com", "1", ttl=1)
+    memory_store.put("long@example.com", "2", ttl=10 * OTP_EXPIRED_GRACE)
+    _run_wheel(memory_store, clock, OTP_EXPIRED_GRACE + 3)
+    assert len(memory_store) == 1
+    assert memory_store.verify("long@example.com", "2") == VERIFIED
@@ -0,0 +1,92 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import rate_limit
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(rate_limit)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, clock):
+    if request.param == "memory":
+        return rate_limit.MemoryBucketStore(capacity=10, refill=2)
+    store = rate_limit.SQLiteBucketStore(capacity=10, refill=2, purge_rate=0)
+    rate_limit.get_state_connection().execute("DELETE FROM rate_bucket")
+    return store
+
+
+def test_bucket_drains_and_reports_the_wait(store):
+    assert [store.take("ip:a", 4) for _ in range(2)] == [0, 0]
+    # 2 tokens left, 4 needed at 2 tokens/s
+    assert store.take("ip:a", 4) == pytest.approx(1.0)
+    # refused requests cost nothing
+    assert store.take("ip:a", 2) == 0
+
+
+def test_bucket_refills_up_to_capacity(store, clock):
+    assert store.take("ip:a", 10) == 0
+    clock.now += 2
+    assert store.take("ip:a", 4) == 0
+    assert store.take("ip:a", 1) == pytest.approx(0.5)
+    clock.now += 3600
+    assert store.take("ip:a", 10) == 0
+    assert store.take("ip:a", 1) == pytest.approx(0.5)
+
+
+def test_buckets_are_per_key(store):
+    assert store.take("ip:a", 10) == 0
+    assert store.take("ip:b", 10) == 0
+
+
+def test_memory_store_prunes_full_buckets_when_at_capacity(clock):
+    store = rate_limit.MemoryBucketStore(capacity=10, refill=2, max_keys=2)
+    store.take("ip:a", 1)
+    store.take("ip:b", 10)
+    clock.now += 2  # a has refilled, b hasn't
+    store.take("ip:c", 1)
+    assert set(store._buckets) == {"ip:b", "ip:c"}
+
+
+def test_sqlite_store_purges_refilled_buckets(clock):
+    store = rate_limit.SQLiteBucketStore(capacity=10, refill=2, purge_rate=0)
+    conn = rate_limit.get_state_connection()
+    conn.execute("DELETE FROM rate_bucket")
+    store.take("ip:a", 1)
+    clock.now += 3
+    store.take("ip:b", 1)
+    store.purge(clock.now + 3)  # a was last touched 6 s ago: full again
+    assert [row[0] for row in conn.execute("SELECT key FROM rate_bucket")] == ["ip:b"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    app = FastAPI()
+
+    @app.post("/expensive")
+    def expensive():
+        return {"ok": True}
+
+    app.add_middleware(rate_limit.RateLimitMiddleware,
+                       store=rate_limit.MemoryBucketStore(capacity=40, refill=0.01),
+                       costs={"/expensive": 10})
+    return TestClient(app)
+
+
+def test_middleware_answers_429_with_retry_after(client):
+    codes = [client.post("/expensive").status_code for _ in range(5)]
+    assert codes == [200, 200, 200, 200, 429]
+    refused = client.post("/expensive")
+    assert refused.status_code == 429
+    assert int(refused.headers["retry-after"]) >= 1
+
+
+def test_client_supplied_lecturer_ids_do_not_get_their_own_bucket(client):
+    codes = [
+        client.post(f"/expensive?lecturer_id=L{n}", headers={"X-Lecturer-ID": f"L{n}"}).status_code
+        for n in range(5)
+    ]
+    assert codes == [200, 200, 200, 200, 429]
@@ -0,0 +1,141 @@
+import hashlib
+import mmap
+import os
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+# Cap on a single uploaded file, and on a whole request body (the file plus the
+# other form fields and multipart framing). The body cap is enforced by
+# BodySizeLimitMiddleware before anything is parsed or spooled.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(MAX_UPLOAD_BYTES + 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 256 * 1024
+
+
+def _too_large(max_bytes):
+    return JSONResponse(status_code=413, content={"detail": f"Request body too large (max {max_bytes} bytes)"})
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies over `max_bytes` with 413: up front when
+    Content-Length says so, otherwise as soon as the bytes received pass the
+    cap (chunked uploads), so an oversized upload is never read or spooled to
+    disk in full. Added outermost, so nothing reads the body before it.
+    """
+
+    def __init__(self, app, max_bytes=MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            return await _too_large(self.max_bytes)(scope, receive, send)
+
+        received = 0
+        started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # answer now; the app sees a disconnect and whatever it
+                    # sends back is dropped
+                    rejected = True
+                    if not started:
+                        await _too_large(self.max_bytes)(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except Exception:
+            if not rejected:
+                raise
+
+
+class SpooledUpload:
+    """
+    An uploaded file, read in place from the SpooledTemporaryFile Starlette
+    parsed it into: small files are in memory, large ones on disk. `view()`
+    exposes the content without copying it (the in-memory buffer, or an mmap
+    of the temp file).
+    """
+
+    def __init__(self, filename, file, size, sha256):
+        self.filename = filename
+        self.file = file
+        self.size = size
+        self.sha256 = sha256
+        self._mmap = None
+        self._view = None
+
+    def view(self):
+        if self._view is None:
+            if self.size == 0:
+                self._view = memoryview(b"")
+            elif getattr(self.file, "_rolled", True):
+                self.file.flush()
+                self._mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._mmap)
+            else:
+                self._view = self.file._file.getbuffer()
+        return self._view
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _measure(file, max_bytes):
+    file.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"File too large (max {max_bytes} bytes)")
+        digest.update(chunk)
+    file.seek(0)
+    return size, digest.hexdigest()
+
+
+async def read_upload(file, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Wraps an UploadFile in a SpooledUpload, hashing it off the event loop.
+    Raises 413 when the file is larger than `max_bytes`.
+    """
+    size, sha256 = await run_in_threadpool(_measure, file.file, max_bytes)
+    return SpooledUpload(file.filename, file.file, size, sha256)